@@ -0,0 +1,94 @@
+"""
+bcrypt verification in a bounded process pool.
+
+A bcrypt check costs around 100 ms of CPU. Running it in the request thread
+would hold a worker (or, under ASGI, the event loop) for that long, so login
+storms could starve every other endpoint. ``check_password`` instead awaits a
+``ProcessPoolExecutor`` of ``LOGIN_HASH_WORKERS`` processes and admits at most
+``LOGIN_MAX_PENDING`` verifications per server worker, rejecting the rest at
+once.
+
+Both limits are per server worker, and both only help under ASGI (the
+Dockerfile runs Uvicorn workers): a sync WSGI worker serves one request at a
+time and blocks for the whole wait. Across the deployment at most
+``WEB_CONCURRENCY * LOGIN_HASH_WORKERS`` hashes run at once and
+``WEB_CONCURRENCY * LOGIN_MAX_PENDING`` logins wait.
+
+This module must not import Django models: the pool's worker processes are
+spawned fresh and only import ``checkpw``.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from django.conf import settings
+
+
+class LoginBusyError(Exception):
+    """Too many logins are already waiting for password verification."""
+
+
+def checkpw(password, password_hash):
+    """``bcrypt.checkpw`` on strings; False for malformed hashes."""
+    try:
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+    except ValueError:
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def pool():
+    """The process pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.LOGIN_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _admission():
+    global _slots
+    with _pool_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.LOGIN_MAX_PENDING)
+        return _slots
+
+
+async def check_password(password, password_hash):
+    """
+    Verify ``password`` against a bcrypt hash in the process pool.
+
+    Raises:
+        LoginBusyError: LOGIN_MAX_PENDING verifications are already queued.
+    """
+    global _pool
+    slots = _admission()
+    # Never wait for a slot: a rejected login is cheap to retry, a queued one
+    # holds its worker for the whole wait
+    if not slots.acquire(blocking=False):
+        raise LoginBusyError()
+    try:
+        executor = pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, checkpw, password, password_hash
+            )
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next login
+            with _pool_lock:
+                if _pool is executor:
+                    _pool = None
+            raise
+    finally:
+        slots.release()
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='staff',
+            options={'base_manager_name': 'objects', 'managed': False},
+        ),
+    ]
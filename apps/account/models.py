@@ -19,6 +19,13 @@ class Customer(models.Model):
         db_table = "customer"
 
 
+class StaffManager(models.Manager):
+    """Defers the ``picture`` bytea; only the picture endpoint reads it."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer("picture")
+
+
 class Staff(models.Model):
     staff_id = models.AutoField(primary_key=True)
     first_name = models.TextField()
@@ -33,9 +40,13 @@ class Staff(models.Model):
     picture = models.BinaryField(blank=True, null=True)
     password_hash = models.TextField(blank=True, null=True)
 
+    objects = StaffManager()
+
     class Meta:
         managed = False
         db_table = "staff"
+        # Related lookups (rental.staff, ...) defer the picture too
+        base_manager_name = "objects"
 
 
 class Users(models.Model):
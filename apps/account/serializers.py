@@ -1,5 +1,10 @@
 from rest_framework import serializers
 
+from apps.geo import hierarchy
+from apps.geo.serializers import GeoLookupField, JoinedAddressSerializer
+from apps.operation.serializers import PaymentSerializer
+from dvd_rental.values_plan import full_name
+
 from .models import Customer, Staff
 
 
@@ -25,6 +30,8 @@ class StaffSerializer(serializers.ModelSerializer):
             "last_update",
         ]
         read_only_fields = ["staff_id", "last_update", "full_name"]
+        method_field_sources = {"full_name": ["first_name", "last_name"]}
+        values_expressions = {"full_name": full_name()}
         extra_kwargs = {
             "password": {"write_only": True},
             "password_hash": {"write_only": True},
@@ -39,8 +46,8 @@ class CustomerSerializer(serializers.ModelSerializer):
     """Serializer for Customer model"""
 
     full_name = serializers.SerializerMethodField()
-    store_id = serializers.IntegerField(source="store.store_id", read_only=True)
-    address_info = serializers.CharField(source="address.address", read_only=True)
+    store_id = serializers.IntegerField(read_only=True)
+    address_info = GeoLookupField(hierarchy.address_line, source="address_id")
 
     class Meta:
         model = Customer
@@ -60,6 +67,8 @@ class CustomerSerializer(serializers.ModelSerializer):
             "active",
         ]
         read_only_fields = ["customer_id", "create_date", "last_update", "full_name"]
+        method_field_sources = {"full_name": ["first_name", "last_name"]}
+        values_expressions = {"full_name": full_name()}
         extra_kwargs = {
             "password_hash": {"write_only": True},
         }
@@ -67,3 +76,94 @@ class CustomerSerializer(serializers.ModelSerializer):
     def get_full_name(self, obj):
         """Combine first and last name"""
         return f"{obj.first_name} {obj.last_name}".strip()
+
+
+class CustomerLookupQuerySerializer(serializers.Serializer):
+    """Query parameters for the customer lookup endpoint"""
+
+    q = serializers.CharField(
+        min_length=3, max_length=100, help_text="Email, phone number or name words"
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class CustomerLoginSerializer(serializers.Serializer):
+    """Credentials for customer login"""
+
+    email = serializers.CharField(max_length=254)
+    password = serializers.CharField(max_length=128, trim_whitespace=False)
+
+
+class StaffLoginSerializer(serializers.Serializer):
+    """Credentials for staff login"""
+
+    username = serializers.CharField(max_length=150)
+    password = serializers.CharField(max_length=128, trim_whitespace=False)
+
+
+class CustomerBalanceQuerySerializer(serializers.Serializer):
+    """Query parameters for the customer balances endpoint"""
+
+    ids = serializers.CharField(
+        required=False, help_text="Comma-separated customer IDs, e.g. 1,2,3"
+    )
+    store = serializers.IntegerField(required=False)
+
+    def validate_ids(self, value):
+        """Parse the comma-separated customer IDs"""
+        try:
+            customer_ids = list(dict.fromkeys(int(part) for part in value.split(",") if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError("Customer IDs must be integers.")
+        if not customer_ids:
+            raise serializers.ValidationError("At least one customer ID is required.")
+        if len(customer_ids) > 500:
+            raise serializers.ValidationError("At most 500 customer IDs are allowed.")
+        return customer_ids
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("store" in attrs):
+            raise serializers.ValidationError("Specify exactly one of 'ids' or 'store'.")
+        return attrs
+
+
+class CustomerBalanceSerializer(serializers.Serializer):
+    """Serializer for customer balance rows"""
+
+    customer_id = serializers.IntegerField()
+    rental_fees = serializers.DecimalField(max_digits=10, decimal_places=2)
+    late_fees = serializers.DecimalField(max_digits=10, decimal_places=2)
+    payments = serializers.DecimalField(max_digits=10, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class CustomerRentalSerializer(serializers.Serializer):
+    """Serializer for the rental rows of a customer summary"""
+
+    rental_id = serializers.IntegerField()
+    rental_date = serializers.DateTimeField()
+    return_date = serializers.DateTimeField(allow_null=True)
+    inventory_id = serializers.IntegerField()
+    film_id = serializers.IntegerField()
+    film_title = serializers.CharField()
+    staff_id = serializers.IntegerField()
+
+
+class CustomerSummaryCustomerSerializer(CustomerSerializer):
+    """``CustomerSerializer`` output with the address line read from ``select_related("address")``"""
+
+    address_info = serializers.CharField(source="address.address", read_only=True)
+
+
+class CustomerSummarySerializer(serializers.Serializer):
+    """
+    Serializer for the customer support screen (CustomerSummaryService.summary
+    plus the customer, loaded with ``select_related("address__city__country")``)
+    """
+
+    customer = CustomerSummaryCustomerSerializer()
+    address = JoinedAddressSerializer(source="customer.address")
+    balance = CustomerBalanceSerializer(allow_null=True)
+    open_rentals = CustomerRentalSerializer(many=True)
+    recent_rentals = CustomerRentalSerializer(many=True)
+    recent_payments = PaymentSerializer(many=True)
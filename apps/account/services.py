@@ -0,0 +1,461 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BinaryField, F, Func, TextField, Value
+from django.db.models.functions import Length, Substr
+from django.utils import timezone
+
+from apps.operation.models import Payment, Rental
+
+from . import hashing
+from .models import Customer, Staff
+
+# The expressions indexed by migrations/014_customer_lookup_indexes.sql; the
+# queries must compile to the same SQL for the planner to use the indexes.
+UPPER_FULL_NAME = Func(
+    F("first_name"),
+    Value(" "),
+    F("last_name"),
+    template="upper(%(expressions)s)",
+    arg_joiner=" || ",
+    output_field=TextField(),
+)
+LOWER_EMAIL = Func(F("email"), function="lower", output_field=TextField())
+PHONE_DIGITS = Func(
+    F("address__phone"), Value(r"\D"), Value(""), Value("g"), function="regexp_replace", output_field=TextField()
+)
+
+
+class CustomerBalanceService:
+    """
+    Service layer for customer balances.
+    Computes what the get_customer_balance() database function returns for
+    many customers with one grouped query, and caches current balances until
+    the customer's next rental, return or payment.
+    """
+
+    CACHE_KEY = "customer_balance:{}"
+
+    @staticmethod
+    def balances(customer_ids):
+        """
+        Current balances for the given customers.
+
+        Cached balances are served as-is; the remaining customers are computed
+        together with one query and cached.
+
+        Args:
+            customer_ids (list[int]): IDs of the customers.
+
+        Returns:
+            list[dict]: One row per existing customer, in the order given, with
+            ``customer_id``, ``rental_fees``, ``late_fees``, ``payments`` and
+            ``balance`` keys. Unknown IDs are omitted.
+        """
+        customer_ids = list(dict.fromkeys(customer_ids))
+        keys = {
+            customer_id: CustomerBalanceService.CACHE_KEY.format(customer_id)
+            for customer_id in customer_ids
+        }
+        cached = cache.get_many(keys.values())
+        balances = {
+            customer_id: cached[key] for customer_id, key in keys.items() if key in cached
+        }
+
+        missing = [customer_id for customer_id in customer_ids if customer_id not in balances]
+        if missing:
+            computed = CustomerBalanceService.compute_balances(missing, timezone.now())
+            cache.set_many(
+                {keys[row["customer_id"]]: row for row in computed},
+                timeout=settings.CUSTOMER_BALANCE_CACHE_TTL,
+            )
+            balances.update((row["customer_id"], row) for row in computed)
+
+        return [balances[customer_id] for customer_id in customer_ids if customer_id in balances]
+
+    @staticmethod
+    def store_balances(store_id):
+        """
+        Current balances for every customer of a store, ordered by customer ID.
+        """
+        customer_ids = (
+            Customer.objects.filter(store_id=store_id)
+            .order_by("customer_id")
+            .values_list("customer_id", flat=True)
+        )
+        return CustomerBalanceService.balances(list(customer_ids))
+
+    @staticmethod
+    def compute_balances(customer_ids, effective_date):
+        """
+        Compute balances as of ``effective_date`` with one set-based query.
+
+        Follows get_customer_balance(): the rental rate of every rental, plus
+        one dollar per whole day a returned rental was kept beyond the film's
+        rental_duration, minus all payments. Rental fees and payments are each
+        aggregated once, grouped by customer_id, instead of once per customer.
+
+        Returns:
+            list[dict]: Rows ordered by customer ID; unknown IDs are omitted.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH fees AS (
+                    SELECT r.customer_id,
+                           SUM(f.rental_rate) AS rental_fees,
+                           SUM(GREATEST(
+                               EXTRACT(DAY FROM r.return_date - r.rental_date) - f.rental_duration,
+                               0
+                           )) AS late_fees
+                    FROM rental r
+                    JOIN inventory i ON i.inventory_id = r.inventory_id
+                    JOIN film f ON f.film_id = i.film_id
+                    WHERE r.customer_id = ANY(%(ids)s) AND r.rental_date <= %(date)s
+                    GROUP BY r.customer_id
+                ), paid AS (
+                    SELECT customer_id, SUM(amount) AS payments
+                    FROM payment
+                    WHERE customer_id = ANY(%(ids)s) AND payment_date <= %(date)s
+                    GROUP BY customer_id
+                )
+                SELECT c.customer_id,
+                       COALESCE(fees.rental_fees, 0) AS rental_fees,
+                       COALESCE(fees.late_fees, 0) AS late_fees,
+                       COALESCE(paid.payments, 0) AS payments
+                FROM customer c
+                LEFT JOIN fees ON fees.customer_id = c.customer_id
+                LEFT JOIN paid ON paid.customer_id = c.customer_id
+                WHERE c.customer_id = ANY(%(ids)s)
+                ORDER BY c.customer_id
+                """,
+                {"ids": list(customer_ids), "date": effective_date},
+            )
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        for row in rows:
+            row["balance"] = row["rental_fees"] + row["late_fees"] - row["payments"]
+        return rows
+
+    @staticmethod
+    def invalidate(customer_ids):
+        """
+        Drop cached balances once the current transaction commits.
+
+        Called by every code path that creates or returns rentals or records
+        payments, so a cached balance is never older than the customer's last
+        rental or payment.
+        """
+        keys = [CustomerBalanceService.CACHE_KEY.format(customer_id) for customer_id in set(customer_ids)]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CustomerLookupService:
+    """
+    Service layer for counter lookups of customers.
+    Routes each query to an indexed access path (migrations/
+    014_customer_lookup_indexes.sql) instead of the icontains scans of
+    ``?search=``: an exact case-insensitive email match on lower(email), a
+    phone match on the digits of the address phone, or a trigram search on
+    the upper-cased full name.
+    """
+
+    EMAIL = "email"
+    PHONE = "phone"
+    NAME = "name"
+
+    PHONE_PATTERN = re.compile(r"^\+?[\d\s().-]+$")
+    MIN_PHONE_DIGITS = 7
+
+    @staticmethod
+    def mode(query):
+        """The lookup mode ``query`` is routed to."""
+        query = query.strip()
+        if "@" in query:
+            return CustomerLookupService.EMAIL
+        if (
+            CustomerLookupService.PHONE_PATTERN.match(query)
+            and len(re.sub(r"\D", "", query)) >= CustomerLookupService.MIN_PHONE_DIGITS
+        ):
+            return CustomerLookupService.PHONE
+        return CustomerLookupService.NAME
+
+    @staticmethod
+    def lookup(query, limit):
+        """
+        Customers matching ``query``.
+
+        Emails match exactly (ignoring case) and phone numbers by their
+        digits, ordered by customer ID. Anything else matches customers whose
+        full name contains every word of the query, ordered by name.
+
+        Returns:
+            tuple[str, QuerySet]: The mode used and up to ``limit`` customers.
+        """
+        mode = CustomerLookupService.mode(query)
+        queryset = Customer.objects.all()
+        if mode == CustomerLookupService.EMAIL:
+            queryset = queryset.alias(email_lower=LOWER_EMAIL).filter(email_lower=query.strip().lower())
+            ordering = ["customer_id"]
+        elif mode == CustomerLookupService.PHONE:
+            queryset = queryset.alias(phone_digits=PHONE_DIGITS).filter(phone_digits=re.sub(r"\D", "", query))
+            ordering = ["customer_id"]
+        else:
+            queryset = queryset.alias(full_name_upper=UPPER_FULL_NAME)
+            for term in query.upper().split():
+                queryset = queryset.filter(full_name_upper__contains=term)
+            ordering = ["last_name", "first_name", "customer_id"]
+        return mode, queryset.order_by(*ordering)[:limit]
+
+
+class CustomerSummaryService:
+    """
+    Service layer for the customer support screen.
+    Gathers a customer's rentals, payments and balance with one indexed
+    query each (the balance is often served from its cache).
+    """
+
+    RECENT_LIMIT = 20
+
+    @staticmethod
+    def rentals(customer_id):
+        """
+        The customer's open rentals and their RECENT_LIMIT most recent
+        rentals, in one UNION query on idx_rental_customer_id_rental_date.
+
+        Returns:
+            tuple[list[dict], list[dict]]: ``(open, recent)`` rows, newest
+            first, with rental, inventory, film and staff IDs and the film title.
+        """
+        columns = (
+            Rental.objects.filter(customer_id=customer_id)
+            .annotate(film_id=F("inventory__film_id"), film_title=F("inventory__film__title"))
+            .values(
+                "rental_id", "rental_date", "return_date", "inventory_id", "film_id", "film_title", "staff_id"
+            )
+        )
+        ordering = ("-rental_date", "-rental_id")
+        recent = columns.order_by(*ordering)[: CustomerSummaryService.RECENT_LIMIT]
+        rows = sorted(
+            recent.union(columns.filter(return_date__isnull=True).order_by()),
+            key=lambda row: (row["rental_date"], row["rental_id"]),
+            reverse=True,
+        )
+
+        # Any rental newer than the RECENT_LIMIT-th most recent one is in the
+        # first branch, so the newest rows of the union are the recent rentals
+        return (
+            [row for row in rows if row["return_date"] is None],
+            rows[: CustomerSummaryService.RECENT_LIMIT],
+        )
+
+    @staticmethod
+    def payments(customer_id):
+        """The customer's RECENT_LIMIT most recent payments, newest first."""
+        return list(
+            Payment.objects.filter(customer_id=customer_id).order_by("-payment_date", "-payment_id")[
+                : CustomerSummaryService.RECENT_LIMIT
+            ]
+        )
+
+    @staticmethod
+    def summary(customer_id):
+        """
+        Rentals, payments and balance of a customer.
+
+        Returns:
+            dict: ``open_rentals``, ``recent_rentals``, ``recent_payments``
+            and ``balance`` (a CustomerBalanceService row, or None).
+        """
+        open_rentals, recent_rentals = CustomerSummaryService.rentals(customer_id)
+        balances = CustomerBalanceService.balances([customer_id])
+        return {
+            "open_rentals": open_rentals,
+            "recent_rentals": recent_rentals,
+            "recent_payments": CustomerSummaryService.payments(customer_id),
+            "balance": balances[0] if balances else None,
+        }
+
+
+class LoginService:
+    """
+    Service layer for customer and staff login.
+    Reads the account's password hash with one indexed query (lower(email)
+    for customers, username for staff), verifies it in the bcrypt process
+    pool (apps/account/hashing.py) and issues signed, expiring tokens that
+    are verified without touching the database.
+    """
+
+    CUSTOMER = "customer"
+    STAFF = "staff"
+    TOKEN_SALT = "apps.account.login"
+
+    # Verified for unknown accounts too, so response times do not reveal
+    # which emails and usernames exist
+    DUMMY_HASH = "$2b$10$ZUBbi7HTwcAnA3B6hDa5Cu6YIKDJpQh9ys3GRz6O5aoQnPF6ypeeK"
+
+    @staticmethod
+    async def login(kind, identifier, password):
+        """
+        Check the credentials of an active customer (by email) or staff
+        member (by username).
+
+        Returns:
+            dict | None: The issued token (see ``issue_token``), or None if
+            the credentials are wrong.
+
+        Raises:
+            hashing.LoginBusyError: Too many logins are being verified.
+        """
+        account = await LoginService.password_hash(kind, identifier)
+        account_id, password_hash = account or (None, None)
+        valid = await hashing.check_password(password, password_hash or LoginService.DUMMY_HASH)
+        if not valid or password_hash is None:
+            return None
+        return LoginService.issue_token(kind, account_id)
+
+    @staticmethod
+    async def password_hash(kind, identifier):
+        """``(id, password_hash)`` of the active account, or None."""
+        if kind == LoginService.CUSTOMER:
+            accounts = (
+                Customer.objects.alias(email_lower=LOWER_EMAIL)
+                .filter(email_lower=identifier.strip().lower(), activebool=True)
+                .order_by("customer_id")
+                .values_list("customer_id", "password_hash")
+            )
+        else:
+            accounts = Staff.objects.filter(username=identifier, active=True).order_by("staff_id").values_list(
+                "staff_id", "password_hash"
+            )
+        return await accounts.afirst()
+
+    @staticmethod
+    def issue_token(kind, account_id):
+        """A signed token for the account, valid for LOGIN_TOKEN_TTL seconds."""
+        return {
+            "token": signing.dumps({"kind": kind, "id": account_id}, salt=LoginService.TOKEN_SALT, compress=True),
+            "token_type": "Bearer",
+            "expires_in": settings.LOGIN_TOKEN_TTL,
+        }
+
+    @staticmethod
+    def verify_token(token):
+        """``(kind, account_id)`` of a valid, unexpired token, or None."""
+        try:
+            claims = signing.loads(token, salt=LoginService.TOKEN_SALT, max_age=settings.LOGIN_TOKEN_TTL)
+        except signing.BadSignature:
+            return None
+        return claims["kind"], claims["id"]
+
+
+class StaffPictureService:
+    """
+    Service layer for staff pictures.
+    ``Staff.objects`` defers the picture bytea; these methods read its size
+    and leading bytes first, so validators and content type are known before
+    any full read, then fetch the bytes in chunks with substring().
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    SNIFF_SIZE = 16
+
+    # Leading bytes of the image formats browsers display
+    SIGNATURES = (
+        (b"\x89PNG\r\n\x1a\n", "image/png"),
+        (b"\xff\xd8\xff", "image/jpeg"),
+        (b"GIF87a", "image/gif"),
+        (b"GIF89a", "image/gif"),
+    )
+
+    @staticmethod
+    def metadata(staff_id):
+        """
+        ``(last_update, size, content_type)`` of a staff member's picture,
+        or None if there is no such staff member or picture.
+        """
+        row = (
+            Staff.objects.filter(staff_id=staff_id, picture__isnull=False)
+            .values_list(
+                "last_update",
+                Length("picture"),
+                Substr("picture", 1, StaffPictureService.SNIFF_SIZE, output_field=BinaryField()),
+            )
+            .first()
+        )
+        if row is None:
+            return None
+        last_update, size, head = row
+        return last_update, size, StaffPictureService.content_type(bytes(head))
+
+    @staticmethod
+    def content_type(head):
+        """Media type of a picture from its leading bytes."""
+        for signature, content_type in StaffPictureService.SIGNATURES:
+            if head.startswith(signature):
+                return content_type
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "image/webp"
+        return "application/octet-stream"
+
+    @staticmethod
+    def etag(staff_id, last_update):
+        """Strong ETag of a picture, derived from the row's last_update."""
+        source = f"staff-picture|{staff_id}|{last_update.isoformat()}"
+        return f'"{hashlib.md5(source.encode()).hexdigest()}"'
+
+    @staticmethod
+    def byte_range(header, size):
+        """
+        The ``(start, end)`` byte positions (inclusive) requested by a Range
+        header for a body of ``size`` bytes.
+
+        Returns:
+            tuple | None | bool: The range; None to send the whole body
+            (no header, multiple ranges or an unparsable header, which the
+            RFC lets servers ignore); False if the range is unsatisfiable.
+        """
+        match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header or "")
+        if match is None or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes
+            if int(last) == 0:
+                return False
+            return max(size - int(last), 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size:
+            return False
+        if end < start:
+            return None
+        return start, end
+
+    @staticmethod
+    def chunks(staff_id, last_update, start, end):
+        """
+        Yield bytes ``start``..``end`` (inclusive) of the picture,
+        CHUNK_SIZE bytes per query.
+
+        Every query is pinned to ``last_update``: if the picture changes
+        mid-stream the body ends early rather than mixing two pictures.
+        """
+        position = start
+        while position <= end:
+            length = min(StaffPictureService.CHUNK_SIZE, end - position + 1)
+            chunk = (
+                Staff.objects.filter(staff_id=staff_id, last_update=last_update)
+                .values_list(Substr("picture", position + 1, length, output_field=BinaryField()), flat=True)
+                .first()
+            )
+            if not chunk:
+                return
+            yield bytes(chunk)
+            position += length
@@ -0,0 +1,349 @@
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from apps.account.authentication import SignedTokenAuthentication
+from apps.account.models import Customer, Staff
+from apps.account.services import (
+    CustomerBalanceService,
+    CustomerLookupService,
+    CustomerSummaryService,
+    LoginService,
+    StaffPictureService,
+)
+from apps.account.views import CustomerViewSet, StaffViewSet, customer_login
+from apps.geo import hierarchy
+from apps.geo.serializers import address_info
+from apps.operation.models import Inventory, Rental
+
+
+def _balance(customer_id, balance="1.00"):
+    return {
+        "customer_id": customer_id,
+        "rental_fees": Decimal(balance),
+        "late_fees": Decimal("0"),
+        "payments": Decimal("0"),
+        "balance": Decimal(balance),
+    }
+
+
+class CustomerBalanceServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("apps.account.services.CustomerBalanceService.compute_balances")
+    def test_balances_computes_only_uncached_customers(self, mock_compute):
+        mock_compute.return_value = [_balance(1), _balance(2)]
+        CustomerBalanceService.balances([1, 2])
+
+        mock_compute.return_value = [_balance(3)]
+        rows = CustomerBalanceService.balances([3, 1, 2, 404])
+
+        self.assertEqual(mock_compute.call_args.args[0], [3, 404])
+        self.assertEqual([row["customer_id"] for row in rows], [3, 1, 2])
+
+    @patch("apps.account.services.CustomerBalanceService.compute_balances")
+    def test_invalidate_drops_cached_balance_on_commit(self, mock_compute):
+        mock_compute.return_value = [_balance(1)]
+        CustomerBalanceService.balances([1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomerBalanceService.invalidate([1])
+
+        mock_compute.return_value = [_balance(1, "5.00")]
+        rows = CustomerBalanceService.balances([1])
+
+        self.assertEqual(mock_compute.call_count, 2)
+        self.assertEqual(rows[0]["balance"], Decimal("5.00"))
+
+
+class CustomerBalanceViewTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = CustomerViewSet.as_view(
+            {"get": "balances"}, **CustomerViewSet.balances.kwargs
+        )
+
+    @patch("apps.account.views.CustomerBalanceService.balances")
+    def test_balances_by_ids(self, mock_balances):
+        mock_balances.return_value = [_balance(7, "12.50")]
+
+        response = self.view(self.factory.get("/api/customers/balances/?ids=7,7,9"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_balances.assert_called_once_with([7, 9])
+        self.assertEqual(response.data[0]["balance"], "12.50")
+
+    @patch("apps.account.views.CustomerBalanceService.store_balances")
+    def test_balances_by_store(self, mock_store_balances):
+        mock_store_balances.return_value = []
+
+        response = self.view(self.factory.get("/api/customers/balances/?store=2"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_store_balances.assert_called_once_with(2)
+
+    def test_balances_requires_ids_or_store(self):
+        response = self.view(self.factory.get("/api/customers/balances/"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StaffSparseFieldsTests(TestCase):
+    def test_list_never_fetches_picture_or_password_columns(self):
+        view = StaffViewSet.as_view({"get": "list"})
+
+        with self.assertNumQueries(2) as captured:
+            response = view(APIRequestFactory().get("/api/staff/"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = captured.captured_queries[1]["sql"]
+        self.assertNotIn('"staff"."picture"', sql)
+        self.assertNotIn('"staff"."password', sql)
+
+
+class CustomerLookupTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.exclude(email=None).select_related("address").first()
+        self.view = CustomerViewSet.as_view({"get": "lookup"}, **CustomerViewSet.lookup.kwargs)
+
+    def test_routes_queries_by_shape(self):
+        self.assertEqual(CustomerLookupService.mode(" Mary.Smith@Example.org "), "email")
+        self.assertEqual(CustomerLookupService.mode("+1 (403) 333-5568"), "phone")
+        self.assertEqual(CustomerLookupService.mode("12345"), "name")
+        self.assertEqual(CustomerLookupService.mode("mary smi"), "name")
+
+    def test_queries_use_the_indexed_expressions(self):
+        _, by_email = CustomerLookupService.lookup("A@B.C", 5)
+        _, by_phone = CustomerLookupService.lookup("403-333-5568", 5)
+        _, by_name = CustomerLookupService.lookup("mary smi", 5)
+
+        self.assertIn('lower("customer"."email") = a@b.c', str(by_email.query))
+        self.assertIn('regexp_replace("address"."phone"', str(by_phone.query))
+        name_sql = str(by_name.query)
+        self.assertIn('upper("customer"."first_name" ||   || "customer"."last_name")::text LIKE %MARY%', name_sql)
+        self.assertIn("LIKE %SMI%", name_sql)
+
+    def test_email_lookup_ignores_case(self):
+        response = self.view(APIRequestFactory().get(
+            "/api/customers/lookup/", {"q": self.customer.email.swapcase()}
+        ))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["mode"], "email")
+        self.assertEqual([row["customer_id"] for row in response.data["results"]], [self.customer.customer_id])
+
+    def test_name_lookup_matches_every_word(self):
+        query = f"{self.customer.last_name[:3]} {self.customer.first_name[1:4]}".lower()
+
+        response = self.view(APIRequestFactory().get("/api/customers/lookup/", {"q": query}))
+
+        self.assertEqual(response.data["mode"], "name")
+        self.assertIn(self.customer.customer_id, [row["customer_id"] for row in response.data["results"]])
+
+    def test_query_is_required(self):
+        response = self.view(APIRequestFactory().get("/api/customers/lookup/", {"q": "ab"}))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoginTests(TestCase):
+    # bcrypt hash of "changeme", as set by migrations/004_customer_auth.sql
+    PASSWORD_HASH = "$2b$10$yCKt4D99d1R8z4LeXU/B6.9weZIMzI5MChWAtCHXFnKyhzG4uBHqS"
+
+    def setUp(self):
+        self.customer = Customer.objects.filter(activebool=True).exclude(email=None).first()
+        Customer.objects.filter(pk=self.customer.pk).update(password_hash=self.PASSWORD_HASH)
+
+    def _login(self, body):
+        request = RequestFactory().post("/api/auth/customers/login/", json.dumps(body), content_type="application/json")
+        response = async_to_sync(customer_login)(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_login_issues_a_token_verified_without_queries(self):
+        status_code, body = self._login({"email": self.customer.email.upper(), "password": "changeme"})
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {body['token']}")
+        with self.assertNumQueries(0):
+            principal, _ = SignedTokenAuthentication().authenticate(request)
+        self.assertEqual((principal.kind, principal.id), ("customer", self.customer.customer_id))
+
+    def test_hash_lookup_is_one_indexed_query(self):
+        with self.assertNumQueries(1) as captured:
+            account = async_to_sync(LoginService.password_hash)("customer", self.customer.email.upper())
+
+        self.assertEqual(account, (self.customer.customer_id, self.PASSWORD_HASH))
+        self.assertIn('lower("customer"."email")', captured.captured_queries[0]["sql"])
+
+    @patch("apps.account.services.hashing.check_password", new_callable=AsyncMock, return_value=True)
+    def test_unknown_account_is_checked_against_a_dummy_hash(self, mock_check):
+        status_code, _ = self._login({"email": "nobody@example.org", "password": "changeme"})
+
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+        mock_check.assert_awaited_once_with("changeme", LoginService.DUMMY_HASH)
+
+    def test_saturated_pool_rejects_without_waiting(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+
+        with patch("apps.account.hashing._admission", return_value=slots):
+            status_code, _ = self._login({"email": self.customer.email, "password": "changeme"})
+
+        self.assertEqual(status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_tampered_token_is_rejected(self):
+        token = LoginService.issue_token("staff", 1)["token"]
+
+        self.assertEqual(LoginService.verify_token(token), ("staff", 1))
+        self.assertIsNone(LoginService.verify_token(token[:-1] + ("A" if token[-1] != "A" else "B")))
+
+
+class CustomerSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        hierarchy.snapshot()
+        self.view = CustomerViewSet.as_view({"get": "summary"}, **CustomerViewSet.summary.kwargs)
+
+    def _get(self, customer_id):
+        response = self.view(APIRequestFactory().get(f"/api/customers/{customer_id}/summary/"), pk=customer_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_summary_takes_at_most_four_queries(self):
+        customer = Customer.objects.filter(rental__isnull=False).first()
+
+        with self.assertNumQueries(4):
+            data = self._get(customer.customer_id)
+
+        self.assertEqual(data["customer"]["customer_id"], customer.customer_id)
+        self.assertEqual(data["address"]["address_id"], customer.address_id)
+        self.assertEqual(data["balance"]["customer_id"], customer.customer_id)
+        self.assertTrue(data["recent_rentals"])
+        self.assertIn("film_title", data["recent_rentals"][0])
+
+        # The balance is cached now
+        with self.assertNumQueries(3):
+            self._get(customer.customer_id)
+
+    def test_summary_with_cold_caches_takes_at_most_four_queries(self):
+        customer = Customer.objects.filter(rental__isnull=False).first()
+        hierarchy.clear()
+
+        with self.assertNumQueries(4):
+            data = self._get(customer.customer_id)
+
+        # Same address output as the hierarchy-backed serializers
+        self.assertEqual(data["address"], address_info(customer.address_id))
+        self.assertEqual(data["customer"]["address_info"], hierarchy.address_line(customer.address_id))
+
+    def test_open_rentals_older_than_the_recent_ones_are_included(self):
+        newest = Rental.objects.filter(return_date__isnull=False).latest("rental_date")
+        free_copy = Inventory.objects.exclude(
+            inventory_id__in=Rental.objects.filter(return_date__isnull=True).values("inventory_id")
+        ).first()
+        Rental.objects.create(
+            rental_date=newest.rental_date - timedelta(days=30),
+            inventory=free_copy,
+            customer_id=newest.customer_id,
+            staff_id=newest.staff_id,
+            last_update=newest.last_update,
+        )
+
+        with patch.object(CustomerSummaryService, "RECENT_LIMIT", 1):
+            open_rentals, recent = CustomerSummaryService.rentals(newest.customer_id)
+
+        self.assertEqual([row["rental_id"] for row in recent], [newest.rental_id])
+        self.assertIn(newest.rental_date - timedelta(days=30), [row["rental_date"] for row in open_rentals])
+        self.assertTrue(all(row["return_date"] is None for row in open_rentals))
+
+    def test_unknown_customer_is_404(self):
+        response = self.view(APIRequestFactory().get("/api/customers/0/summary/"), pk=0)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StaffPictureTests(TestCase):
+    PICTURE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+    def setUp(self):
+        staff_id = Staff.objects.values_list("staff_id", flat=True).first()
+        Staff.objects.filter(pk=staff_id).update(picture=self.PICTURE)
+        # Re-read: the last_update trigger changed it
+        self.staff = Staff.objects.get(pk=staff_id)
+        self.view = StaffViewSet.as_view({"get": "picture"})
+
+    def _get(self, **headers):
+        response = self.view(
+            APIRequestFactory().get(f"/api/staff/{self.staff.pk}/picture/", **headers), pk=str(self.staff.pk)
+        )
+        if hasattr(response, "render"):
+            response.render()
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_staff_querysets_defer_the_picture(self):
+        self.assertIn("picture", Staff.objects.get(pk=self.staff.pk).get_deferred_fields())
+        self.assertIn("picture", Rental.objects.filter(staff=self.staff).first().staff.get_deferred_fields())
+
+    @patch.object(StaffPictureService, "CHUNK_SIZE", 100)
+    def test_streams_the_picture_in_chunks(self):
+        response, body = self._get(HTTP_ACCEPT="image/png")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(int(response["Content-Length"]), len(self.PICTURE))
+        self.assertEqual(body, self.PICTURE)
+        self.assertEqual(response["ETag"], StaffPictureService.etag(self.staff.pk, self.staff.last_update))
+
+    def test_matching_etag_is_not_modified_without_reading_bytes(self):
+        first, _ = self._get()
+
+        with self.assertNumQueries(1) as captured:
+            response, _ = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn('LENGTH("staff"."picture")', captured.captured_queries[0]["sql"])
+
+    def test_range_requests(self):
+        etag = StaffPictureService.etag(self.staff.pk, self.staff.last_update)
+
+        response, body = self._get(HTTP_RANGE="bytes=8-15")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response["Content-Range"], f"bytes 8-15/{len(self.PICTURE)}")
+        self.assertEqual(body, self.PICTURE[8:16])
+
+        response, body = self._get(HTTP_RANGE="bytes=8-15", HTTP_IF_RANGE=etag)
+        self.assertEqual(body, self.PICTURE[8:16])
+
+        response, body = self._get(HTTP_RANGE="bytes=8-15", HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, self.PICTURE)
+
+        response, _ = self._get(HTTP_RANGE=f"bytes={len(self.PICTURE)}-")
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.PICTURE)}")
+
+    def test_byte_range_parsing(self):
+        self.assertEqual(StaffPictureService.byte_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(StaffPictureService.byte_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(StaffPictureService.byte_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(StaffPictureService.byte_range("bytes=50-500", 100), (50, 99))
+        self.assertIsNone(StaffPictureService.byte_range(None, 100))
+        self.assertIsNone(StaffPictureService.byte_range("bytes=0-1,5-9", 100))
+        self.assertFalse(StaffPictureService.byte_range("bytes=100-", 100))
+
+    def test_missing_picture_is_404(self):
+        Staff.objects.filter(pk=self.staff.pk).update(picture=None)
+
+        response, _ = self._get()
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,12 +1,14 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import CustomerViewSet, StaffViewSet
+from .views import CustomerViewSet, StaffViewSet, customer_login, staff_login
 
 router = DefaultRouter()
 router.register(r"customers", CustomerViewSet, basename="customer")
 router.register(r"staff", StaffViewSet, basename="staff")
 
 urlpatterns = [
+    path("auth/customers/login/", customer_login, name="customer-login"),
+    path("auth/staff/login/", staff_login, name="staff-login"),
     path("", include(router.urls)),
 ]
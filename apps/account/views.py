@@ -1,16 +1,47 @@
+import json
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.response import Response
+
+from dvd_rental.mixins import ConditionalGetMixin, SparseFieldsMixin, ValuesListMixin
 
+from .hashing import LoginBusyError
 from .models import Customer, Staff
-from .serializers import CustomerSerializer, StaffSerializer
+from .serializers import (
+    CustomerBalanceQuerySerializer,
+    CustomerBalanceSerializer,
+    CustomerLoginSerializer,
+    CustomerLookupQuerySerializer,
+    CustomerSerializer,
+    CustomerSummarySerializer,
+    StaffLoginSerializer,
+    StaffSerializer,
+)
+from .services import (
+    CustomerBalanceService,
+    CustomerLookupService,
+    CustomerSummaryService,
+    LoginService,
+    StaffPictureService,
+)
 
 
-class StaffViewSet(viewsets.ModelViewSet):
+class StaffViewSet(SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Staff model.
 
     Provides CRUD operations for staff data with name search.
+    ``{id}/picture/`` serves the staff picture, which every other staff
+    query defers (see ``StaffManager``).
     """
 
     queryset = Staff.objects.select_related("store", "address").all()
@@ -21,18 +52,185 @@ class StaffViewSet(viewsets.ModelViewSet):
     ordering_fields = ["staff_id", "first_name", "last_name"]
     ordering = ["staff_id"]
 
+    def perform_content_negotiation(self, request, force=False):
+        # Image requests (Accept: image/*) must not fail negotiation; errors
+        # still render with the first renderer
+        return super().perform_content_negotiation(request, force=force or self.action == "picture")
+
+    @action(detail=True, methods=["get"])
+    def picture(self, request, pk=None):
+        """
+        The staff member's picture, with the content type sniffed from its
+        leading bytes.
+
+        Supports conditional requests (ETag derived from ``last_update``,
+        Last-Modified) and single byte ranges (``Range``, ``If-Range``).
+        The body is streamed in chunks read with substring(), so the whole
+        bytea is never loaded at once.
+        """
+        try:
+            staff_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        metadata = StaffPictureService.metadata(staff_id)
+        if metadata is None:
+            raise NotFound("This staff member has no picture.")
+        last_update, size, content_type = metadata
+        etag = StaffPictureService.etag(staff_id, last_update)
+        last_modified = http_date(last_update.timestamp())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_update.timestamp()))
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        # A Range only applies while the client's copy is current
+        byte_range = None
+        if request.headers.get("If-Range") in (None, etag, last_modified):
+            byte_range = StaffPictureService.byte_range(request.headers.get("Range"), size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        status_code = 206 if byte_range else 200
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=content_type, status=status_code)
+        else:
+            response = StreamingHttpResponse(
+                StaffPictureService.chunks(staff_id, last_update, start, end),
+                content_type=content_type,
+                status=status_code,
+            )
+        response["Content-Length"] = end - start + 1
+        if byte_range:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Last-Modified"] = last_modified
+        response["Cache-Control"] = "no-cache"
+        return response
 
-class CustomerViewSet(viewsets.ModelViewSet):
+
+class CustomerViewSet(SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Customer model.
 
-    Provides CRUD operations for customer data with search and filtering.
+    Provides CRUD operations for customer data with search and filtering,
+    plus bulk balance lookups, indexed counter lookups (``lookup/``) and a
+    support-screen summary per customer (``{id}/summary/``).
     """
 
-    queryset = Customer.objects.select_related("store", "address").all()
+    queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["store", "activebool"]
     search_fields = ["first_name", "last_name", "email"]
     ordering_fields = ["customer_id", "first_name", "last_name", "create_date"]
     ordering = ["customer_id"]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "summary":
+            # One customer's address: join it rather than load the whole geo
+            # hierarchy cache when it is cold
+            queryset = queryset.select_related("address__city__country")
+        return queryset
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def lookup(self, request):
+        """
+        Counter lookup by email, phone number or name, each served by an
+        index: an ``@`` selects an exact case-insensitive email match, a
+        phone-like query (at least 7 digits) matches address phones by their
+        digits, and anything else matches full names containing every word.
+
+        Query parameters: ``q`` (3-100 characters) and ``limit`` (1-50, default 20).
+        """
+        params = CustomerLookupQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        mode, customers = CustomerLookupService.lookup(
+            params.validated_data["q"], params.validated_data["limit"]
+        )
+        return Response(
+            {"mode": mode, "results": self.get_serializer(customers, many=True).data}
+        )
+
+    @action(detail=True, methods=["get"], serializer_class=CustomerSummarySerializer)
+    def summary(self, request, pk=None):
+        """
+        Everything the support screen shows for a customer: profile, address,
+        open rentals, the 20 most recent rentals with film titles, the 20
+        most recent payments and the current balance.
+
+        At most four queries: the customer joined with its address, city and
+        country, rentals (one UNION), payments and the balance (skipped when
+        cached).
+        """
+        customer = self.get_object()
+        summary = CustomerSummaryService.summary(customer.customer_id)
+        return Response(CustomerSummarySerializer({"customer": customer, **summary}).data)
+
+    @action(detail=False, methods=["get"], serializer_class=CustomerBalanceSerializer)
+    def balances(self, request):
+        """
+        Current balances for many customers at once.
+
+        Query parameters: either ``ids`` (comma-separated customer IDs) or
+        ``store`` (every customer of that store).
+        """
+        params = CustomerBalanceQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        if "ids" in params.validated_data:
+            rows = CustomerBalanceService.balances(params.validated_data["ids"])
+        else:
+            rows = CustomerBalanceService.store_balances(params.validated_data["store"])
+        return Response(CustomerBalanceSerializer(rows, many=True).data)
+
+
+# Login views are plain async Django views (DRF views are sync): under ASGI
+# the event loop keeps serving other requests while bcrypt runs in the
+# process pool.
+
+
+@csrf_exempt
+@require_POST
+async def customer_login(request):
+    """
+    Issue a token for a customer. JSON body: ``email`` and ``password``.
+
+    Returns ``token``, ``token_type`` ("Bearer") and ``expires_in`` seconds;
+    401 for wrong credentials, 429 when too many logins are in progress.
+    """
+    return await _login(request, CustomerLoginSerializer, LoginService.CUSTOMER, "email")
+
+
+@csrf_exempt
+@require_POST
+async def staff_login(request):
+    """Issue a token for a staff member. JSON body: ``username`` and ``password``."""
+    return await _login(request, StaffLoginSerializer, LoginService.STAFF, "username")
+
+
+async def _login(request, serializer_class, kind, identifier_field):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "Request body must be JSON."}, status=400)
+    params = serializer_class(data=data)
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=400)
+
+    try:
+        token = await LoginService.login(
+            kind, params.validated_data[identifier_field], params.validated_data["password"]
+        )
+    except LoginBusyError:
+        response = JsonResponse({"detail": "Too many logins in progress, retry shortly."}, status=429)
+        response["Retry-After"] = "1"
+        return response
+    if token is None:
+        return JsonResponse({"detail": "Invalid credentials."}, status=401)
+    return JsonResponse(token)
@@ -0,0 +1,44 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from rest_framework.filters import BaseFilterBackend
+
+
+class FilmFullTextSearchFilter(BaseFilterBackend):
+    """
+    Ranked full-text search over film.fulltext (``?q=``).
+
+    The query is parsed with websearch_to_tsquery (quoted phrases, ``or``,
+    ``-excluded``) and matched against the indexed tsvector, so the search
+    uses film_fulltext_idx instead of scanning title/description with ILIKE.
+    Results are ordered by relevance unless an explicit ``ordering`` is given.
+    Place after OrderingFilter so the rank ordering is not overridden.
+    """
+
+    search_param = "q"
+    # film_fulltext_trigger builds the vector with the english configuration
+    search_config = "english"
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, "").strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch", config=self.search_config)
+        queryset = queryset.filter(fulltext=query).annotate(
+            search_rank=SearchRank(F("fulltext"), query)
+        )
+        if "ordering" in request.query_params:
+            return queryset
+        return queryset.order_by("-search_rank", "film_id")
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text search on title and description "
+                '(web search syntax: "quoted phrase", or, -exclude)',
+                "schema": {"type": "string"},
+            }
+        ]
@@ -0,0 +1,75 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from rest_framework.test import APIRequestFactory
+
+from dvd_rental import reference_cache
+from dvd_rental.mixins import ValuesListMixin
+
+ROUTED_APPS = ("apps.catalog", "apps.geo", "apps.account", "apps.operation")
+
+
+class Command(BaseCommand):
+    help = (
+        "Time each list endpoint with the values() fast path (ValuesListMixin) "
+        "against the regular serializer path, and check the responses are "
+        "byte-identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Page size to render.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per path.")
+        parser.add_argument("--only", nargs="*", default=[], help="Route prefixes to run (e.g. films).")
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1 or options["repeat"] < 1:
+            raise CommandError("--rows and --repeat must be positive.")
+
+        # Requests must pass ALLOWED_HOSTS (the reference cache keys on the host)
+        host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+        factory = APIRequestFactory(HTTP_HOST=host)
+        self.stdout.write(f"{'endpoint':<20}{'rows':>6}{'serializer ms':>15}{'values ms':>11}{'speedup':>9}  output")
+        for prefix, viewset in self._routes():
+            if options["only"] and prefix not in options["only"]:
+                continue
+            url = f"/api/{prefix}/"
+            pagination = viewset.pagination_class or import_string(
+                settings.REST_FRAMEWORK["DEFAULT_PAGINATION_CLASS"]
+            )
+            pagination = type("BenchmarkPagination", (pagination,), {"page_size": options["rows"]})
+
+            timings, contents = {}, {}
+            for enabled in (False, True):
+                view = viewset.as_view(
+                    {"get": "list"}, pagination_class=pagination, values_list_enabled=enabled
+                )
+                runs = []
+                for _ in range(options["repeat"] + 1):
+                    reference_cache.responses.clear()
+                    started = time.perf_counter()
+                    response = view(factory.get(url))
+                    response.render()
+                    runs.append(time.perf_counter() - started)
+                # The first run warms up connections and compiled queries
+                timings[enabled] = statistics.median(runs[1:]) * 1000
+                contents[enabled] = response.content
+                rows = len(response.data.get("results", response.data))
+
+            identical = contents[True] == contents[False]
+            self.stdout.write(
+                f"{url:<20}{rows:>6}{timings[False]:>15.1f}{timings[True]:>11.1f}"
+                f"{timings[False] / timings[True]:>8.1f}x  "
+                + (self.style.SUCCESS("identical") if identical else self.style.ERROR("DIFFERENT"))
+            )
+
+    @staticmethod
+    def _routes():
+        for app in ROUTED_APPS:
+            router = import_module(f"{app}.urls").router
+            for prefix, viewset, _ in router.registry:
+                if issubclass(viewset, ValuesListMixin):
+                    yield prefix, viewset
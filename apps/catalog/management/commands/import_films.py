@@ -0,0 +1,64 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.services import FilmImportService
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load films, cast/category links and inventory from a CSV or "
+        "NDJSON release feed through COPY staging tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=FilmImportService.FORMATS,
+            help="Feed format (default: from the file extension).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per batch.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"]
+        if fmt is None:
+            fmt = "csv" if path.endswith(".csv") else "ndjson" if path.endswith((".ndjson", ".jsonl")) else None
+        if fmt is None:
+            raise CommandError("Cannot infer the feed format; pass --format.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        try:
+            stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+
+        totals = {"rows": 0, "inserted": 0, "updated": 0, "errors": 0}
+        started = time.monotonic()
+        with stream:
+            for progress in FilmImportService.import_rows(
+                FilmImportService.read_rows(stream, fmt), batch_size=options["batch_size"]
+            ):
+                for name in ("rows", "inserted", "updated"):
+                    totals[name] += progress[name]
+                totals["errors"] += len(progress["errors"])
+                for error in progress["errors"]:
+                    self.stderr.write(f"line {error['line']}: {error['error']}")
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{totals['rows']} rows, {totals['inserted']} inserted, "
+                    f"{totals['updated']} updated, {totals['errors']} skipped, "
+                    f"{totals['rows'] / elapsed if elapsed else 0:.0f} rows/s"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {totals['inserted'] + totals['updated']} films from {totals['rows']} rows "
+                f"({totals['inserted']} new, {totals['updated']} updated, {totals['errors']} skipped) "
+                f"in {elapsed:.2f}s ({totals['rows'] / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmCoRental',
+            fields=[
+                ('pk', models.CompositePrimaryKey('film_id', 'similar_film_id', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('customers', models.IntegerField()),
+                ('last_update', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'film_co_rental',
+                'managed': False,
+            },
+        ),
+    ]
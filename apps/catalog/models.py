@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -52,7 +53,8 @@ class Film(models.Model):
     rating = models.TextField(blank=True, null=True)
     last_update = models.DateTimeField()
     special_features = models.TextField(blank=True, null=True)
-    fulltext = models.TextField()
+    # Maintained by film_fulltext_trigger from title and description
+    fulltext = SearchVectorField()
 
     class Meta:
         managed = False
@@ -79,3 +81,17 @@ class FilmCategory(models.Model):
     class Meta:
         managed = False
         db_table = "film_category"
+
+
+class FilmCoRental(models.Model):
+    """Distinct customers who rented both films (see build_recommendations)"""
+
+    pk = models.CompositePrimaryKey("film_id", "similar_film_id")
+    film = models.ForeignKey("catalog.Film", models.DO_NOTHING, related_name="co_rentals")
+    similar_film = models.ForeignKey("catalog.Film", models.DO_NOTHING, related_name="+")
+    customers = models.IntegerField()
+    last_update = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "film_co_rental"
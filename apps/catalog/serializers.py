@@ -1,6 +1,10 @@
 from rest_framework import serializers
 
+from dvd_rental.mixins import IncludeFieldsMixin
+from dvd_rental.values_plan import full_name
+
 from .models import Actor, Category, Film, Language
+from .services import FilmFacetService
 
 
 class LanguageSerializer(serializers.ModelSerializer):
@@ -21,28 +25,48 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ["category_id", "last_update"]
 
 
-class ActorSerializer(serializers.ModelSerializer):
-    """Serializer for Actor model"""
+class ActorSerializer(IncludeFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Actor model; ``films`` only with ?include=films"""
 
     full_name = serializers.SerializerMethodField()
+    films = serializers.SerializerMethodField()
 
     class Meta:
         model = Actor
-        fields = ["actor_id", "first_name", "last_name", "full_name", "last_update"]
+        fields = ["actor_id", "first_name", "last_name", "full_name", "last_update", "films"]
         read_only_fields = ["actor_id", "last_update", "full_name"]
+        include_fields = ["films"]
+        method_field_sources = {"full_name": ["first_name", "last_name"], "films": []}
+        values_expressions = {"full_name": full_name()}
 
     def get_full_name(self, obj):
         """Combine first and last name"""
         return f"{obj.first_name} {obj.last_name}".strip()
 
+    def get_films(self, obj):
+        """Filmography from the prefetched film_actor rows"""
+        return [
+            {
+                "film_id": film_actor.film.film_id,
+                "title": film_actor.film.title,
+                "release_year": film_actor.film.release_year,
+            }
+            for film_actor in obj.filmactor_set.all()
+        ]
+
 
-class FilmSerializer(serializers.ModelSerializer):
-    """Serializer for Film model with basic info"""
+class FilmSerializer(IncludeFieldsMixin, serializers.ModelSerializer):
+    """
+    Serializer for Film model with basic info; ``actors`` and ``categories``
+    only with ?include=actors,categories
+    """
 
     language_name = serializers.CharField(source="language.name", read_only=True)
     original_language_name = serializers.CharField(
         source="original_language.name", read_only=True
     )
+    actors = serializers.SerializerMethodField()
+    categories = serializers.SerializerMethodField()
 
     class Meta:
         model = Film
@@ -61,5 +85,62 @@ class FilmSerializer(serializers.ModelSerializer):
             "replacement_cost",
             "rating",
             "last_update",
+            "actors",
+            "categories",
         ]
         read_only_fields = ["film_id", "last_update"]
+        include_fields = ["actors", "categories"]
+        method_field_sources = {"actors": [], "categories": []}
+
+    def get_actors(self, obj):
+        """Cast from the prefetched film_actor rows"""
+        return [
+            {
+                "actor_id": film_actor.actor.actor_id,
+                "first_name": film_actor.actor.first_name,
+                "last_name": film_actor.actor.last_name,
+            }
+            for film_actor in obj.filmactor_set.all()
+        ]
+
+    def get_categories(self, obj):
+        """Categories from the ``category_rows`` annotation (FilmViewSet)"""
+        return [
+            {"category_id": row["category_id"], "name": row["name"]}
+            for row in getattr(obj, "category_rows", None) or []
+        ]
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Query parameters for the typeahead endpoints"""
+
+    q = serializers.CharField(min_length=2, max_length=50)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class SimilarFilmQuerySerializer(serializers.Serializer):
+    """Query parameters for the similar-films endpoint"""
+
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+
+
+class FilmFacetQuerySerializer(serializers.Serializer):
+    """Query parameters for the film facets endpoint (besides the list filters)"""
+
+    facets = serializers.CharField(
+        required=False,
+        help_text="Comma-separated subset of rating,release_year,language,category "
+        "(default: all)",
+    )
+
+    def validate_facets(self, value):
+        """Parse the comma-separated facet names"""
+        facets = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(facets) - set(FilmFacetService.FACETS)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown facet(s): {', '.join(sorted(unknown))}."
+            )
+        if not facets:
+            raise serializers.ValidationError("At least one facet is required.")
+        return [name for name in FilmFacetService.FACETS if name in facets]
@@ -0,0 +1,746 @@
+import csv
+import hashlib
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+from operator import itemgetter
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, TextField, Value, When
+from django.db.models.functions import Concat
+
+from .models import Actor, Film, FilmCoRental
+
+
+class AutocompleteService:
+    """
+    Service layer for search-box typeahead.
+    Returns only IDs and display names, matched by substring through the
+    trigram indexes in migrations/011_trigram_indexes.sql, and caches each
+    (query, limit) result for AUTOCOMPLETE_CACHE_TTL seconds.
+    """
+
+    @staticmethod
+    def films(query, limit):
+        """
+        Films whose title contains ``query``, title-prefix matches first.
+
+        Returns:
+            list[dict]: Rows with ``film_id`` and ``title``.
+        """
+        return AutocompleteService._cached(
+            "film",
+            query,
+            limit,
+            lambda: list(
+                Film.objects.filter(title__icontains=query)
+                .annotate(prefix_rank=AutocompleteService._prefix_rank("title", query))
+                .order_by("prefix_rank", "title", "film_id")
+                .values("film_id", "title")[:limit]
+            ),
+        )
+
+    @staticmethod
+    def actors(query, limit):
+        """
+        Actors matching every word of ``query`` in their first or last name.
+
+        "pen gui" finds PENELOPE GUINESS; last-name prefix matches come first.
+
+        Returns:
+            list[dict]: Rows with ``actor_id`` and ``full_name``.
+        """
+
+        def fetch():
+            queryset = Actor.objects.all()
+            for term in query.split():
+                queryset = queryset.filter(
+                    Q(first_name__icontains=term) | Q(last_name__icontains=term)
+                )
+            return list(
+                queryset.annotate(
+                    prefix_rank=AutocompleteService._prefix_rank("last_name", query.split()[0]),
+                    full_name=Concat(
+                        "first_name", Value(" "), "last_name", output_field=TextField()
+                    ),
+                )
+                .order_by("prefix_rank", "last_name", "first_name", "actor_id")
+                .values("actor_id", "full_name")[:limit]
+            )
+
+        return AutocompleteService._cached("actor", query, limit, fetch)
+
+    @staticmethod
+    def _prefix_rank(field, query):
+        return Case(
+            When(**{f"{field}__istartswith": query}, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+
+    @staticmethod
+    def _cached(kind, query, limit, fetch):
+        # Searches are case-insensitive, so "acad" and "ACAD" share an entry.
+        key = f"autocomplete:{kind}:{limit}:{quote(' '.join(query.upper().split()))}"
+        rows = cache.get(key)
+        if rows is None:
+            rows = fetch()
+            cache.set(key, rows, timeout=settings.AUTOCOMPLETE_CACHE_TTL)
+        return rows
+
+
+class FilmFacetService:
+    """
+    Service layer for film browse facets.
+    Counts films by rating, release year, language and category for a
+    filtered film queryset with one GROUPING SETS aggregation, and caches
+    the result per filter combination for FILM_FACETS_CACHE_TTL seconds.
+    """
+
+    FACETS = ("rating", "release_year", "language", "category")
+
+    # Grouping set, GROUPING() flag and selected columns of each facet
+    FACET_SQL = {
+        "rating": ("(film.rating)", "film.rating::text AS rating"),
+        "release_year": ("(film.release_year)", "film.release_year"),
+        "language": ("(film.language_id, language.name)", "film.language_id, language.name AS language_name"),
+        "category": ("(fc.category_id, category.name)", "fc.category_id, category.name AS category_name"),
+    }
+    GROUPING_COLUMN = {
+        "rating": "film.rating",
+        "release_year": "film.release_year",
+        "language": "film.language_id",
+        "category": "fc.category_id",
+    }
+
+    @staticmethod
+    def facets(queryset, facets, cache_params):
+        """
+        Facet counts for the films in ``queryset``.
+
+        Args:
+            queryset (QuerySet): Filtered Film queryset (the list filters).
+            facets (list[str]): Facets to compute, a subset of FACETS.
+            cache_params (list[tuple]): Normalized filter parameters
+                identifying the combination in the cache.
+
+        Returns:
+            dict: ``total`` plus one list per facet of ``{"value", "count"}``
+            (``{"id", "name", "count"}`` for language and category).
+        """
+        digest = hashlib.sha1(urlencode(sorted(cache_params)).encode()).hexdigest()
+        key = f"film_facets:{','.join(facets)}:{digest}"
+        result = cache.get(key)
+        if result is None:
+            result = FilmFacetService._compute(queryset, facets)
+            cache.set(key, result, timeout=settings.FILM_FACETS_CACHE_TTL)
+        return result
+
+    @staticmethod
+    def _compute(queryset, facets):
+        film_ids = queryset.order_by().values("film_id")
+        filtered_sql, params = film_ids.query.get_compiler(using=film_ids.db).as_sql()
+
+        with_category = "category" in facets
+        grouping_sets = [FilmFacetService.FACET_SQL[name][0] for name in facets] + ["()"]
+        columns = [FilmFacetService.FACET_SQL[name][1] for name in facets]
+        flags = [
+            f"GROUPING({FilmFacetService.GROUPING_COLUMN[name]}) AS g_{name}" for name in facets
+        ]
+        # Films appear once per category when film_category is joined.
+        count = "COUNT(DISTINCT film.film_id)" if with_category else "COUNT(*)"
+        joins = ["JOIN language ON language.language_id = film.language_id"]
+        if with_category:
+            joins += [
+                "LEFT JOIN film_category fc ON fc.film_id = film.film_id",
+                "LEFT JOIN category ON category.category_id = fc.category_id",
+            ]
+
+        sql = f"""
+            SELECT {", ".join(flags)}, {", ".join(columns)}, {count} AS count
+            FROM film
+            {" ".join(joins)}
+            WHERE film.film_id IN ({filtered_sql})
+            GROUP BY GROUPING SETS ({", ".join(grouping_sets)})
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+
+        result = {"total": 0, **{name: [] for name in facets}}
+        for row in rows:
+            grouped = [name for name in facets if row[f"g_{name}"] == 0]
+            if not grouped:
+                result["total"] = row["count"]
+            elif grouped == ["rating"]:
+                result["rating"].append({"value": row["rating"], "count": row["count"]})
+            elif grouped == ["release_year"]:
+                result["release_year"].append(
+                    {"value": row["release_year"], "count": row["count"]}
+                )
+            elif grouped == ["language"]:
+                result["language"].append(
+                    {
+                        "id": row["language_id"],
+                        "name": row["language_name"].strip(),
+                        "count": row["count"],
+                    }
+                )
+            elif grouped == ["category"] and row["category_id"] is not None:
+                result["category"].append(
+                    {"id": row["category_id"], "name": row["category_name"], "count": row["count"]}
+                )
+
+        for name in ("rating", "release_year"):
+            if name in result:
+                result[name].sort(key=lambda item: (item["value"] is None, item["value"]))
+        for name in ("language", "category"):
+            if name in result:
+                result[name].sort(key=lambda item: item["name"])
+        return result
+
+
+class FilmImportService:
+    """
+    Service layer for bulk catalog ingestion (distributor release feeds).
+    Rows are validated in Python per batch, COPY'd into temporary staging
+    tables, checked against the reference tables in SQL and then upserted
+    into film, film_actor, film_category and inventory with a handful of
+    set-based statements per batch instead of one request per film.
+
+    Films are matched on case-insensitive title and release year. Empty
+    fields keep the existing value on update and the column default on
+    insert. Actor/category links are only ever added, and inventory is
+    topped up to the requested number of copies per store.
+    """
+
+    FORMATS = ("csv", "ndjson")
+    RATINGS = {"G", "PG", "PG-13", "R", "NC-17"}
+    SPECIAL_FEATURES = {"Trailers", "Commentaries", "Deleted Scenes", "Behind the Scenes"}
+
+    # Staging columns in COPY order (after ``line``)
+    FILM_COLUMNS = (
+        "title",
+        "description",
+        "release_year",
+        "language_id",
+        "original_language_id",
+        "rental_duration",
+        "rental_rate",
+        "length",
+        "replacement_cost",
+        "rating",
+        "special_features",
+    )
+
+    STAGING_SQL = """
+        DROP TABLE IF EXISTS film_import, film_import_actor, film_import_category,
+            film_import_inventory;
+        CREATE TEMP TABLE film_import (
+            line integer PRIMARY KEY,
+            title text NOT NULL,
+            description text,
+            release_year integer,
+            language_id integer NOT NULL,
+            original_language_id integer,
+            rental_duration smallint,
+            rental_rate numeric(4,2),
+            length smallint,
+            replacement_cost numeric(5,2),
+            rating text,
+            special_features text,
+            film_id integer,
+            is_new boolean NOT NULL DEFAULT false
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE film_import_actor (line integer, actor_id integer) ON COMMIT DROP;
+        CREATE TEMP TABLE film_import_category (line integer, category_id integer) ON COMMIT DROP;
+        CREATE TEMP TABLE film_import_inventory (line integer, store_id integer, copies integer)
+            ON COMMIT DROP;
+    """
+
+    # (line, message) for staged rows referencing missing reference rows
+    INVALID_REFERENCES_SQL = """
+        SELECT s.line, 'Unknown language_id ' || s.language_id
+        FROM film_import s
+        WHERE NOT EXISTS (SELECT 1 FROM language l WHERE l.language_id = s.language_id)
+        UNION ALL
+        SELECT s.line, 'Unknown original_language_id ' || s.original_language_id
+        FROM film_import s
+        WHERE s.original_language_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM language l WHERE l.language_id = s.original_language_id)
+        UNION ALL
+        SELECT a.line, 'Unknown actor_id ' || a.actor_id
+        FROM film_import_actor a
+        WHERE NOT EXISTS (SELECT 1 FROM actor WHERE actor.actor_id = a.actor_id)
+        UNION ALL
+        SELECT c.line, 'Unknown category_id ' || c.category_id
+        FROM film_import_category c
+        WHERE NOT EXISTS (SELECT 1 FROM category WHERE category.category_id = c.category_id)
+        UNION ALL
+        SELECT i.line, 'Unknown store_id ' || i.store_id
+        FROM film_import_inventory i
+        WHERE NOT EXISTS (SELECT 1 FROM store WHERE store.store_id = i.store_id)
+    """
+
+    UPSERT_SQL = (
+        # Existing films by natural key (lowest film_id if the catalog has duplicates)
+        """
+        UPDATE film_import s SET film_id = f.film_id
+        FROM (
+            SELECT DISTINCT ON (upper(title), release_year) film_id, upper(title) AS key, release_year
+            FROM film
+            WHERE upper(title) IN (SELECT upper(title) FROM film_import)
+            ORDER BY upper(title), release_year, film_id
+        ) f
+        WHERE f.key = upper(s.title) AND f.release_year IS NOT DISTINCT FROM s.release_year
+        """,
+        """
+        UPDATE film f SET
+            title = s.title,
+            description = COALESCE(s.description, f.description),
+            language_id = s.language_id,
+            original_language_id = COALESCE(s.original_language_id, f.original_language_id),
+            rental_duration = COALESCE(s.rental_duration, f.rental_duration),
+            rental_rate = COALESCE(s.rental_rate, f.rental_rate),
+            length = COALESCE(s.length, f.length),
+            replacement_cost = COALESCE(s.replacement_cost, f.replacement_cost),
+            rating = COALESCE(s.rating::mpaa_rating, f.rating),
+            special_features = COALESCE(string_to_array(s.special_features, ','), f.special_features)
+        FROM film_import s
+        WHERE s.film_id = f.film_id
+        """,
+        # New films get their IDs up front so the link tables can use them
+        """
+        UPDATE film_import SET film_id = nextval('film_film_id_seq'), is_new = true
+        WHERE film_id IS NULL
+        """,
+        """
+        INSERT INTO film (
+            film_id, title, description, release_year, language_id, original_language_id,
+            rental_duration, rental_rate, length, replacement_cost, rating, special_features
+        )
+        SELECT
+            film_id, title, description, release_year, language_id, original_language_id,
+            COALESCE(rental_duration, 3), COALESCE(rental_rate, 4.99), length,
+            COALESCE(replacement_cost, 19.99), COALESCE(rating, 'G')::mpaa_rating,
+            string_to_array(special_features, ',')
+        FROM film_import
+        WHERE is_new
+        """,
+        """
+        INSERT INTO film_actor (actor_id, film_id)
+        SELECT DISTINCT a.actor_id, s.film_id
+        FROM film_import_actor a JOIN film_import s USING (line)
+        ON CONFLICT DO NOTHING
+        """,
+        """
+        INSERT INTO film_category (film_id, category_id)
+        SELECT DISTINCT s.film_id, c.category_id
+        FROM film_import_category c JOIN film_import s USING (line)
+        ON CONFLICT DO NOTHING
+        """,
+        """
+        INSERT INTO inventory (film_id, store_id)
+        SELECT s.film_id, i.store_id
+        FROM film_import_inventory i
+        JOIN film_import s USING (line)
+        CROSS JOIN LATERAL generate_series(
+            1,
+            i.copies - CASE WHEN s.is_new THEN 0 ELSE (
+                SELECT count(*) FROM inventory inv
+                WHERE inv.film_id = s.film_id AND inv.store_id = i.store_id
+            ) END
+        )
+        """,
+    )
+
+    @staticmethod
+    def read_rows(lines, fmt):
+        """
+        Parse a feed into raw row dicts.
+
+        Args:
+            lines (Iterable[str]): Feed text, line by line.
+            fmt (str): ``csv`` (header row with column names; lists separated
+                by ``;`` and inventory as ``store:copies;...``) or ``ndjson``
+                (one JSON object per line; lists as arrays and inventory as
+                ``{"store_id": copies}``).
+
+        Yields:
+            tuple: ``(line number, row dict)``; the dict is None when the
+            line cannot be parsed.
+
+        Raises:
+            ValidationError: If the format is not supported.
+        """
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+        elif fmt == "ndjson":
+            for number, text in enumerate(lines, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError:
+                    row = None
+                yield number, row if isinstance(row, dict) else None
+        else:
+            raise ValidationError(f"Unsupported import format {fmt!r}; use csv or ndjson.")
+
+    @staticmethod
+    def import_rows(rows, batch_size=5000):
+        """
+        Validate and load parsed rows, one transaction per batch.
+
+        Args:
+            rows (Iterable[tuple]): ``(line number, row dict)`` from read_rows.
+            batch_size (int): Rows per COPY/upsert round trip.
+
+        Yields:
+            dict: Per-batch progress with ``rows``, ``inserted``, ``updated``
+            and ``errors`` (list of ``{"line", "error"}`` for skipped rows).
+        """
+        batch = []
+        for item in rows:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield FilmImportService._import_batch(batch)
+                batch = []
+        if batch:
+            yield FilmImportService._import_batch(batch)
+
+    @staticmethod
+    def _import_batch(batch):
+        films, actors, categories, inventory, errors = [], [], [], [], []
+        # Later rows for the same title/year supersede earlier ones in a batch
+        seen = {}
+        for number, raw in batch:
+            try:
+                film, actor_ids, category_ids, copies = FilmImportService.clean_row(raw)
+            except ValueError as exc:
+                errors.append({"line": number, "error": str(exc)})
+                continue
+            key = (film[0].upper(), film[2])
+            if key in seen:
+                errors.append({"line": seen[key], "error": f"Superseded by line {number}"})
+            seen[key] = number
+            films.append((number, *film))
+            actors.extend((number, actor_id) for actor_id in actor_ids)
+            categories.extend((number, category_id) for category_id in category_ids)
+            inventory.extend((number, store_id, count) for store_id, count in copies.items())
+
+        if len(seen) < len(films):
+            kept = set(seen.values())
+            films = [row for row in films if row[0] in kept]
+            actors = [row for row in actors if row[0] in kept]
+            categories = [row for row in categories if row[0] in kept]
+            inventory = [row for row in inventory if row[0] in kept]
+        result = {"rows": len(batch), "inserted": 0, "updated": 0, "errors": errors}
+        if not films:
+            return result
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Serialize imports so concurrent feeds cannot insert the same title twice
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('film_import'))")
+            cursor.execute(FilmImportService.STAGING_SQL)
+            FilmImportService._copy(
+                cursor, "film_import", ("line", *FilmImportService.FILM_COLUMNS), films
+            )
+            FilmImportService._copy(cursor, "film_import_actor", ("line", "actor_id"), actors)
+            FilmImportService._copy(
+                cursor, "film_import_category", ("line", "category_id"), categories
+            )
+            FilmImportService._copy(
+                cursor, "film_import_inventory", ("line", "store_id", "copies"), inventory
+            )
+
+            cursor.execute(FilmImportService.INVALID_REFERENCES_SQL)
+            invalid = cursor.fetchall()
+            if invalid:
+                lines = sorted({line for line, _ in invalid})
+                for table in ("film_import", "film_import_actor", "film_import_category", "film_import_inventory"):
+                    cursor.execute(f"DELETE FROM {table} WHERE line = ANY(%s)", [lines])
+                errors.extend({"line": line, "error": message} for line, message in sorted(invalid))
+
+            for sql in FilmImportService.UPSERT_SQL:
+                cursor.execute(sql)
+            cursor.execute("SELECT count(*) FILTER (WHERE is_new), count(*) FILTER (WHERE NOT is_new) FROM film_import")
+            result["inserted"], result["updated"] = cursor.fetchone()
+
+        errors.sort(key=lambda error: error["line"])
+        return result
+
+    @staticmethod
+    def clean_row(raw):
+        """
+        Validate one feed row.
+
+        Returns:
+            tuple: ``(film values in FILM_COLUMNS order, actor IDs,
+            category IDs, {store_id: copies})``.
+
+        Raises:
+            ValueError: With a message naming the offending field.
+        """
+        if raw is None:
+            raise ValueError("Malformed row")
+        get = raw.get
+        title = (get("title") or "").strip()
+        if not title:
+            raise ValueError("title is required")
+        language_id = _int(get("language_id"), "language_id", 1)
+        if language_id is None:
+            raise ValueError("language_id is required")
+        release_year = _int(get("release_year"), "release_year", 1901, 2155)
+        rating = _text(get("rating"))
+        if rating is not None and rating not in FilmImportService.RATINGS:
+            raise ValueError(f"rating must be one of {', '.join(sorted(FilmImportService.RATINGS))}")
+        features = _list(get("special_features"))
+        unknown = set(features) - FilmImportService.SPECIAL_FEATURES
+        if unknown:
+            raise ValueError(f"Unknown special_features {', '.join(sorted(unknown))}")
+
+        film = (
+            title,
+            _text(get("description")),
+            release_year,
+            language_id,
+            _int(get("original_language_id"), "original_language_id", 1),
+            _int(get("rental_duration"), "rental_duration", 1, 32767),
+            _decimal(get("rental_rate"), "rental_rate", Decimal("100")),
+            _int(get("length"), "length", 1, 32767),
+            _decimal(get("replacement_cost"), "replacement_cost", Decimal("1000")),
+            rating,
+            ",".join(features) if features else None,
+        )
+        actor_ids = [_int(value, "actor_ids", 1) for value in _list(get("actor_ids"))]
+        category_ids = [_int(value, "category_ids", 1) for value in _list(get("category_ids"))]
+
+        copies = get("inventory") or {}
+        if isinstance(copies, str):
+            try:
+                copies = dict(item.split(":", 1) for item in _list(copies))
+            except ValueError:
+                raise ValueError("inventory must be store_id:copies pairs") from None
+        if not isinstance(copies, dict):
+            raise ValueError("inventory must map store_id to copies")
+        copies = {
+            _int(store_id, "inventory store_id", 1): _int(count, "inventory copies", 0, 1000)
+            for store_id, count in copies.items()
+        }
+        return film, actor_ids, category_ids, copies
+
+    @staticmethod
+    def _copy(cursor, table, columns, rows):
+        if not rows:
+            return
+        buffer = io.StringIO()
+        buffer.writelines("\t".join(map(_copy_value, row)) + "\n" for row in rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+class RecommendationService:
+    """
+    Service layer for "customers who rented this also rented".
+    film_co_rental (migrations/013_film_co_rental.sql) counts, per ordered
+    film pair, the distinct customers who rented both. It is updated in
+    batch from rentals newer than a watermark, counting each customer's new
+    pairs in Python chunk by chunk instead of self-joining rental, and read
+    top-k per film through an index.
+    """
+
+    # Films of the given customers up to the run's upper bound, flagged when
+    # already rented at or before the watermark (i.e. already counted)
+    HISTORY_SQL = """
+        SELECT r.customer_id, i.film_id, min(r.rental_id) <= %(since)s AS counted
+        FROM rental r
+        JOIN inventory i ON i.inventory_id = r.inventory_id
+        WHERE r.customer_id = ANY(%(customers)s) AND r.rental_id <= %(upto)s
+        GROUP BY r.customer_id, i.film_id
+        ORDER BY r.customer_id
+    """
+
+    ADD_COUNTS_SQL = """
+        INSERT INTO film_co_rental (film_id, similar_film_id, customers)
+        SELECT * FROM unnest(%s::integer[], %s::integer[], %s::integer[])
+        ON CONFLICT (film_id, similar_film_id) DO UPDATE
+        SET customers = film_co_rental.customers + EXCLUDED.customers,
+            last_update = now()
+    """
+
+    @staticmethod
+    def similar_films(film_id, limit):
+        """
+        Films most often rented by customers who also rented ``film_id``.
+
+        Returns:
+            list[dict]: Rows with ``film_id``, ``title``, ``release_year``,
+            ``rating`` and ``customers`` (shared renters), best first.
+        """
+        rows = (
+            FilmCoRental.objects.filter(film_id=film_id)
+            .order_by("-customers", "similar_film_id")
+            .values(
+                "similar_film_id",
+                "similar_film__title",
+                "similar_film__release_year",
+                "similar_film__rating",
+                "customers",
+            )[:limit]
+        )
+        return [
+            {
+                "film_id": row["similar_film_id"],
+                "title": row["similar_film__title"],
+                "release_year": row["similar_film__release_year"],
+                "rating": row["similar_film__rating"],
+                "customers": row["customers"],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def update_co_rentals(chunk_size=500, rebuild=False):
+        """
+        Add the co-rentals of rentals newer than the watermark (all rentals
+        with ``rebuild``) to film_co_rental, in one transaction.
+
+        Args:
+            chunk_size (int): Customers whose history is loaded at a time.
+            rebuild (bool): Recount from scratch instead of incrementally.
+
+        Yields:
+            dict: Per-chunk progress with ``customers``, ``pairs`` (film
+            pairs incremented) and ``last_customer_id``.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            # One builder at a time; readers keep seeing the previous counts
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('film_co_rental'))")
+            since = 0
+            if rebuild:
+                cursor.execute("DELETE FROM film_co_rental")
+            else:
+                cursor.execute("SELECT last_rental_id FROM film_co_rental_state")
+                row = cursor.fetchone()
+                since = row[0] if row else 0
+            cursor.execute("SELECT coalesce(max(rental_id), 0) FROM rental")
+            upto = cursor.fetchone()[0]
+
+            cursor.execute(
+                "SELECT DISTINCT customer_id FROM rental "
+                "WHERE rental_id > %s AND rental_id <= %s ORDER BY customer_id",
+                [since, upto],
+            )
+            customers = [row[0] for row in cursor.fetchall()]
+            for start in range(0, len(customers), chunk_size):
+                chunk = customers[start : start + chunk_size]
+                cursor.execute(
+                    RecommendationService.HISTORY_SQL,
+                    {"customers": chunk, "since": since, "upto": upto},
+                )
+                counts = RecommendationService.pair_counts(cursor.fetchall())
+                if counts:
+                    film_ids, similar_ids = zip(*counts)
+                    cursor.execute(
+                        RecommendationService.ADD_COUNTS_SQL,
+                        [list(film_ids), list(similar_ids), list(counts.values())],
+                    )
+                yield {"customers": len(chunk), "pairs": len(counts), "last_customer_id": chunk[-1]}
+
+            cursor.execute(
+                """
+                INSERT INTO film_co_rental_state (id, last_rental_id) VALUES (true, %s)
+                ON CONFLICT (id) DO UPDATE
+                SET last_rental_id = EXCLUDED.last_rental_id, last_update = now()
+                """,
+                [upto],
+            )
+
+    @staticmethod
+    def pair_counts(rows):
+        """
+        Count new co-rented film pairs.
+
+        Args:
+            rows (Iterable[tuple]): ``(customer_id, film_id, counted)`` grouped
+                by customer; ``counted`` marks films whose pairs with each
+                other were counted by an earlier run.
+
+        Returns:
+            dict: ``{(film_id, similar_film_id): customers}`` for both orders
+            of every pair involving at least one newly rented film.
+        """
+        counts = defaultdict(int)
+        for _, films in groupby(rows, key=itemgetter(0)):
+            counted, new = [], []
+            for _, film_id, was_counted in films:
+                (counted if was_counted else new).append(film_id)
+            for index, film_id in enumerate(new):
+                for other in counted + new[index + 1 :]:
+                    counts[film_id, other] += 1
+                    counts[other, film_id] += 1
+        return counts
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(";") if item.strip()]
+    if isinstance(value, list):
+        return [str(item).strip() for item in value]
+    raise ValueError("Expected a list")
+
+
+def _int(value, name, minimum, maximum=2147483647):
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if not minimum <= number <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+
+def _decimal(value, name, limit):
+    if value is None or value == "":
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a decimal") from None
+    if not number.is_finite() or not 0 <= number < limit:
+        raise ValueError(f"{name} must be between 0 and {limit}")
+    return number
+
+
+def _copy_value(value):
+    """Encode one value for COPY text format"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
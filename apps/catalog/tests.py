@@ -0,0 +1,467 @@
+import sys
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.catalog.filters import FilmFullTextSearchFilter
+from apps.catalog.models import Actor, Film, FilmActor
+from apps.catalog.serializers import FilmSerializer
+from apps.catalog.services import (
+    AutocompleteService,
+    FilmFacetService,
+    FilmImportService,
+    RecommendationService,
+)
+from apps.catalog.views import ActorViewSet, FilmViewSet
+from apps.operation.models import Inventory
+from dvd_rental.values_plan import WHITESPACE, ValuesPlan
+
+
+class FilmFullTextSearchFilterTests(TestCase):
+    def _sql(self, url):
+        request = Request(APIRequestFactory().get(url))
+        queryset = FilmFullTextSearchFilter().filter_queryset(
+            request, FilmViewSet.queryset, view=None
+        )
+        return str(queryset.query)
+
+    def test_matches_indexed_tsvector_and_orders_by_rank(self):
+        sql = self._sql("/api/films/?q=space -documentary")
+
+        self.assertIn(
+            '"film"."fulltext" @@ (websearch_to_tsquery(english::regconfig, space -documentary))',
+            sql,
+        )
+        self.assertIn('AS "search_rank"', sql)
+        self.assertRegex(sql, r'ORDER BY \d+ DESC, "film"."film_id" ASC$')
+        self.assertNotIn("LIKE", sql)
+
+    def test_explicit_ordering_wins_over_rank(self):
+        sql = self._sql("/api/films/?q=space&ordering=title")
+
+        self.assertNotRegex(sql, r"ORDER BY \d+ DESC")
+
+    def test_without_q_the_queryset_is_unchanged(self):
+        sql = self._sql("/api/films/?rating=G")
+
+        self.assertNotIn("tsquery", sql)
+        self.assertNotIn('"film"."fulltext"', sql)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    @patch("apps.catalog.services.Film.objects.filter")
+    def test_films_cached_per_query_case_insensitively(self, mock_filter):
+        rows = [{"film_id": 1, "title": "ACADEMY DINOSAUR"}]
+        mock_filter.return_value.annotate.return_value.order_by.return_value.values.return_value = rows
+
+        self.assertEqual(AutocompleteService.films("acad", 10), rows)
+        self.assertEqual(AutocompleteService.films("ACAD", 10), rows)
+
+        mock_filter.assert_called_once_with(title__icontains="acad")
+
+    def test_actor_query_matches_every_word_in_either_name(self):
+        with patch("apps.catalog.services.AutocompleteService._cached") as mock_cached:
+            AutocompleteService.actors("pen gui", 5)
+            fetch = mock_cached.call_args.args[3]
+
+        with self.assertNumQueries(1) as captured:
+            fetch()
+        sql = captured.captured_queries[0]["sql"]
+        self.assertIn("UPPER('%pen%')", sql)
+        self.assertIn("UPPER('%gui%')", sql)
+        self.assertIn("LIMIT 5", sql)
+
+    @patch("apps.catalog.views.AutocompleteService.films")
+    def test_film_autocomplete_view(self, mock_films):
+        mock_films.return_value = [{"film_id": 1, "title": "ACADEMY DINOSAUR"}]
+        view = FilmViewSet.as_view({"get": "autocomplete"}, **FilmViewSet.autocomplete.kwargs)
+
+        response = view(self.factory.get("/api/films/autocomplete/?q=aca&limit=5"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, mock_films.return_value)
+        mock_films.assert_called_once_with("aca", 5)
+
+    def test_autocomplete_rejects_single_character(self):
+        view = ActorViewSet.as_view({"get": "autocomplete"}, **ActorViewSet.autocomplete.kwargs)
+
+        response = view(self.factory.get("/api/actors/autocomplete/?q=a"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FilmFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def test_single_grouping_sets_query(self):
+        queryset = Film.objects.filter(rating="PG")
+
+        with self.assertNumQueries(1) as captured:
+            result = FilmFacetService.facets(queryset, ["rating", "language"], [("rating", "PG")])
+
+        sql = captured.captured_queries[0]["sql"]
+        self.assertIn("GROUPING SETS", sql)
+        self.assertNotIn("film_category", sql)
+        self.assertEqual(result["total"], queryset.count())
+        self.assertEqual(set(result), {"total", "rating", "language"})
+
+    def test_cached_per_filter_combination(self):
+        with patch.object(FilmFacetService, "_compute", return_value={"total": 0}) as compute:
+            FilmFacetService.facets(Film.objects.all(), ["rating"], [("rating", "PG")])
+            FilmFacetService.facets(Film.objects.all(), ["rating"], [("rating", "PG")])
+            FilmFacetService.facets(Film.objects.all(), ["rating"], [("rating", "G")])
+
+        self.assertEqual(compute.call_count, 2)
+
+    def test_facets_view_rejects_unknown_facet(self):
+        view = FilmViewSet.as_view({"get": "facets"}, **FilmViewSet.facets.kwargs)
+
+        response = view(self.factory.get("/api/films/facets/?facets=rating,studio"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("facets", response.data)
+
+
+class FilmImportTests(TestCase):
+    HEADER = "title,release_year,language_id,rating,special_features,actor_ids,inventory\n"
+
+    def _import(self, text, fmt="csv"):
+        rows = FilmImportService.read_rows(text.splitlines(keepends=True), fmt)
+        return list(FilmImportService.import_rows(rows))
+
+    def test_clean_row_parses_csv_lists(self):
+        film, actor_ids, category_ids, copies = FilmImportService.clean_row(
+            {
+                "title": " NEW RELEASE ",
+                "language_id": "1",
+                "rental_rate": "2.99",
+                "special_features": "Trailers;Commentaries",
+                "actor_ids": "1;2",
+                "inventory": "1:3;2:1",
+            }
+        )
+
+        self.assertEqual(film[0], "NEW RELEASE")
+        self.assertEqual(film[-1], "Trailers,Commentaries")
+        self.assertEqual(actor_ids, [1, 2])
+        self.assertEqual(category_ids, [])
+        self.assertEqual(copies, {1: 3, 2: 1})
+
+    def test_clean_row_rejects_bad_values(self):
+        for raw, message in [
+            ({"language_id": "1"}, "title"),
+            ({"title": "X", "language_id": "1", "rating": "XXX"}, "rating"),
+            ({"title": "X", "language_id": "1", "release_year": "1800"}, "release_year"),
+            ({"title": "X", "language_id": "1", "inventory": "1"}, "inventory"),
+        ]:
+            with self.assertRaisesMessage(ValueError, message):
+                FilmImportService.clean_row(raw)
+
+    def test_inserts_new_films_with_links_and_inventory(self):
+        progress = self._import(self.HEADER + "IMPORTED FILM,2024,1,PG-13,Trailers,1;2,1:2\n")
+
+        self.assertEqual(progress[0]["inserted"], 1)
+        film = Film.objects.get(title="IMPORTED FILM")
+        self.assertEqual(film.rating, "PG-13")
+        self.assertEqual(FilmActor.objects.filter(film=film).count(), 2)
+        self.assertEqual(Inventory.objects.filter(film=film, store_id=1).count(), 2)
+
+    def test_reimport_updates_and_tops_up_inventory(self):
+        self._import(self.HEADER + "IMPORTED FILM,2024,1,PG,,1,1:2\n")
+
+        progress = self._import(
+            '{"title": "imported film", "release_year": 2024, "language_id": 1, '
+            '"rating": "R", "actor_ids": [1], "inventory": {"1": 3}}\n',
+            fmt="ndjson",
+        )
+
+        self.assertEqual((progress[0]["inserted"], progress[0]["updated"]), (0, 1))
+        film = Film.objects.get(title="imported film")
+        self.assertEqual(film.rating, "R")
+        self.assertEqual(FilmActor.objects.filter(film=film).count(), 1)
+        self.assertEqual(Inventory.objects.filter(film=film).count(), 3)
+
+    def test_unknown_references_are_skipped(self):
+        progress = self._import(self.HEADER + "GOOD FILM,2024,1,,,,\nBAD FILM,2024,99999,,,,\n")
+
+        self.assertEqual(progress[0]["inserted"], 1)
+        self.assertEqual(progress[0]["errors"], [{"line": 3, "error": "Unknown language_id 99999"}])
+        self.assertFalse(Film.objects.filter(title="BAD FILM").exists())
+
+    def test_import_endpoint_requires_admin_and_feed_content_type(self):
+        view = FilmViewSet.as_view({"post": "bulk_import"}, **FilmViewSet.bulk_import.kwargs)
+        factory = APIRequestFactory()
+
+        request = factory.post("/api/films/import/", self.HEADER, content_type="text/csv")
+        self.assertEqual(view(request).status_code, status.HTTP_403_FORBIDDEN)
+
+        request = factory.post("/api/films/import/", "{}", content_type="application/json")
+        force_authenticate(request, user=User(username="admin", is_staff=True))
+        self.assertEqual(view(request).status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        request = factory.post(
+            "/api/films/import/", self.HEADER + "API FILM,2024,1,,,,\n", content_type="text/csv"
+        )
+        force_authenticate(request, user=User(username="admin", is_staff=True))
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inserted"], 1)
+
+
+class IncludeTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_film_list_with_cast_and_categories_in_fixed_queries(self):
+        view = FilmViewSet.as_view({"get": "list"})
+        request = self.factory.get("/api/films/?include=actors,categories")
+
+        # Validators/count aggregate, the films with their categories, the cast
+        with self.assertNumQueries(3):
+            response = view(request)
+            response.render()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for film in response.data["results"]:
+            self.assertIn("actors", film)
+            self.assertIn("categories", film)
+
+    def test_actor_filmography_in_fixed_queries(self):
+        view = ActorViewSet.as_view({"get": "list"})
+
+        with self.assertNumQueries(3):
+            response = view(self.factory.get("/api/actors/?include=films"))
+            response.render()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for actor in response.data["results"]:
+            self.assertIn("films", actor)
+
+    def test_related_fields_omitted_unless_included(self):
+        view = FilmViewSet.as_view({"get": "list"})
+
+        with self.assertNumQueries(2):
+            response = view(self.factory.get("/api/films/"))
+            response.render()
+
+        for film in response.data["results"]:
+            self.assertNotIn("actors", film)
+            self.assertNotIn("categories", film)
+
+    def test_unknown_include_is_rejected(self):
+        view = FilmViewSet.as_view({"get": "list"})
+
+        response = view(self.factory.get("/api/films/?include=actors,reviews"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("reviews", str(response.data["include"]))
+
+
+class RecommendationTests(TestCase):
+    def test_pair_counts_only_count_pairs_with_new_films(self):
+        rows = [(1, 10, True), (1, 20, True), (1, 11, False), (1, 12, False), (2, 10, False)]
+
+        counts = RecommendationService.pair_counts(rows)
+
+        self.assertEqual(
+            set(counts),
+            {(11, 10), (10, 11), (11, 20), (20, 11), (12, 10), (10, 12), (12, 20), (20, 12), (11, 12), (12, 11)},
+        )
+        self.assertTrue(all(count == 1 for count in counts.values()))
+
+    def test_rebuild_matches_self_join(self):
+        list(RecommendationService.update_co_rentals(chunk_size=1, rebuild=True))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.film_id, b.film_id, count(DISTINCT ra.customer_id)
+                FROM rental ra
+                JOIN inventory a ON a.inventory_id = ra.inventory_id
+                JOIN rental rb ON rb.customer_id = ra.customer_id
+                JOIN inventory b ON b.inventory_id = rb.inventory_id
+                WHERE a.film_id <> b.film_id
+                GROUP BY 1, 2
+                """
+            )
+            expected = {(film_id, other): count for film_id, other, count in cursor.fetchall()}
+            cursor.execute("SELECT film_id, similar_film_id, customers FROM film_co_rental")
+            self.assertEqual({(film_id, other): count for film_id, other, count in cursor.fetchall()}, expected)
+
+        # Nothing new since the watermark: nothing to do
+        self.assertEqual(list(RecommendationService.update_co_rentals()), [])
+
+    @patch("apps.catalog.views.RecommendationService.similar_films")
+    def test_similar_view(self, mock_similar):
+        mock_similar.return_value = [{"film_id": 2, "title": "FILM 2", "customers": 3}]
+        view = FilmViewSet.as_view({"get": "similar"}, **FilmViewSet.similar.kwargs)
+        factory = APIRequestFactory()
+
+        response = view(factory.get("/api/films/1/similar/?limit=5"), pk="1")
+
+        self.assertEqual(response.data, mock_similar.return_value)
+        mock_similar.assert_called_once_with(1, 5)
+        self.assertEqual(view(factory.get("/api/films/x/similar/"), pk="x").status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.list_view = FilmViewSet.as_view({"get": "list"})
+        self.detail_view = FilmViewSet.as_view({"get": "retrieve"})
+
+    def test_list_etag_and_not_modified_before_fetching_rows(self):
+        first = self.list_view(self.factory.get("/api/films/?rating=PG"))
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.has_header("Last-Modified"))
+
+        # Only the max(last_update)/count aggregate runs
+        with self.assertNumQueries(1):
+            second = self.list_view(
+                self.factory.get("/api/films/?rating=PG", HTTP_IF_NONE_MATCH=first["ETag"])
+            )
+
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_etag_depends_on_query_params(self):
+        first = self.list_view(self.factory.get("/api/films/?rating=PG"))
+
+        other = self.list_view(
+            self.factory.get("/api/films/?rating=G", HTTP_IF_NONE_MATCH=first["ETag"])
+        )
+
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(other["ETag"], first["ETag"])
+
+    def test_list_page_reuses_aggregate_count(self):
+        # aggregate (validators + count) and the page itself; no second COUNT(*)
+        with self.assertNumQueries(2):
+            response = self.list_view(self.factory.get("/api/films/"))
+
+        self.assertEqual(response.data["count"], Film.objects.count())
+
+    def test_detail_with_malformed_pk_is_not_found(self):
+        for url in ["/api/films/abc/", "/api/languages/abc/", "/api/customers/abc/", "/api/cities/1.5/"]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_if_modified_since(self):
+        film_id = Film.objects.values_list("film_id", flat=True).first()
+        first = self.detail_view(self.factory.get(f"/api/films/{film_id}/"), pk=str(film_id))
+
+        second = self.detail_view(
+            self.factory.get(
+                f"/api/films/{film_id}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+            ),
+            pk=str(film_id),
+        )
+
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.list_view = FilmViewSet.as_view({"get": "list"})
+
+    def test_fields_trim_output_and_projection(self):
+        with self.assertNumQueries(2) as captured:
+            response = self.list_view(self.factory.get("/api/films/?fields=film_id,title,language_name"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data["results"][0]), ["film_id", "title", "language_name"])
+        sql = captured.captured_queries[1]["sql"]
+        self.assertIn('"language"."name"', sql)
+        self.assertNotIn('"film"."description"', sql)
+        self.assertEqual(sql.count("JOIN"), 1)
+
+    def test_default_projection_skips_unserialized_columns(self):
+        with self.assertNumQueries(2) as captured:
+            self.list_view(self.factory.get("/api/films/"))
+
+        self.assertNotIn('"film"."fulltext"', captured.captured_queries[1]["sql"])
+        self.assertNotIn('"film"."special_features"', captured.captured_queries[1]["sql"])
+
+    def test_include_fields_come_from_prefetch(self):
+        film_id = Film.objects.values_list("film_id", flat=True).first()
+        view = FilmViewSet.as_view({"get": "retrieve"})
+
+        response = view(
+            self.factory.get(f"/api/films/{film_id}/?fields=title,actors&include=actors"),
+            pk=str(film_id),
+        )
+
+        self.assertEqual(list(response.data), ["title", "actors"])
+
+    def test_unknown_field_rejected(self):
+        response = self.list_view(self.factory.get("/api/films/?fields=title,fulltext"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", response.data)
+
+
+class ValuesListTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def _content(self, url, enabled):
+        view = FilmViewSet.as_view({"get": "list"}, values_list_enabled=enabled)
+        response = view(self.factory.get(url))
+        response.render()
+        return response.content
+
+    def test_output_identical_to_serializer(self):
+        for url in [
+            "/api/films/",
+            "/api/films/?fields=title,original_language_name,rental_rate",
+            "/api/films/?q=film&include=categories",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self._content(url, True), self._content(url, False))
+
+    def test_plan_mirrors_missing_related_rows(self):
+        plan = ValuesPlan.compile(FilmSerializer(context={"include": set()}))
+
+        self.assertIn("language__name", plan.values)
+        # original_language_name is omitted, not null, when there is no original language
+        self.assertIn("original_language", plan.values)
+        row = {name: None for name in plan.values} | {"language": 1}
+        data = plan.render(row)
+        self.assertNotIn("original_language_name", data)
+        self.assertIsNone(data["language_name"])
+
+    def test_full_name_strips_all_whitespace_like_python(self):
+        self.assertEqual(
+            set(WHITESPACE), {char for char in map(chr, range(sys.maxunicode + 1)) if char.isspace()}
+        )
+        actor = Actor.objects.create(
+            first_name="\t\u3000PENELOPE", last_name="GUINESS\n\xa0", last_update=timezone.now()
+        )
+        content = {}
+        for enabled in (False, True):
+            view = ActorViewSet.as_view({"get": "list"}, values_list_enabled=enabled)
+            response = view(self.factory.get("/api/actors/?search=GUINESS&fields=actor_id,full_name"))
+            response.render()
+            content[enabled] = response.content
+
+        self.assertEqual(content[True], content[False])
+        self.assertIn(f'{{"actor_id":{actor.actor_id},"full_name":"PENELOPE GUINESS"}}'.encode(), content[True])
+
+    def test_prefetched_include_falls_back(self):
+        serializer = FilmSerializer(context={"include": {"actors"}})
+
+        self.assertIsNone(ValuesPlan.compile(serializer))
@@ -1,21 +1,40 @@
+import codecs
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db.models import JSONField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import JSONObject
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, UnsupportedMediaType
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from dvd_rental.mixins import ConditionalGetMixin, IncludeMixin, ReferenceCacheMixin, SparseFieldsMixin, ValuesListMixin
 
-from .models import Actor, Category, Film, Language
+from .filters import FilmFullTextSearchFilter
+from .models import Actor, Category, Film, FilmActor, FilmCategory, Language
 from .serializers import (
     ActorSerializer,
+    AutocompleteQuerySerializer,
     CategorySerializer,
+    FilmFacetQuerySerializer,
     FilmSerializer,
     LanguageSerializer,
+    SimilarFilmQuerySerializer,
 )
+from .services import AutocompleteService, FilmFacetService, FilmImportService, RecommendationService
 
 
-class LanguageViewSet(viewsets.ModelViewSet):
+class LanguageViewSet(
+    ReferenceCacheMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet
+):
     """
     ViewSet for Language model.
 
-    Provides CRUD operations for language data.
+    Provides CRUD operations for language data. Reads are served from the
+    reference-data response cache.
     """
 
     queryset = Language.objects.all()
@@ -26,11 +45,14 @@ class LanguageViewSet(viewsets.ModelViewSet):
     ordering = ["name"]
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(
+    ReferenceCacheMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet
+):
     """
     ViewSet for Category model.
 
-    Provides CRUD operations for film category data.
+    Provides CRUD operations for film category data. Reads are served from
+    the reference-data response cache.
     """
 
     queryset = Category.objects.all()
@@ -41,11 +63,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering = ["name"]
 
 
-class ActorViewSet(viewsets.ModelViewSet):
+class ActorViewSet(IncludeMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Actor model.
 
-    Provides CRUD operations for actor data with search by name.
+    Provides CRUD operations for actor data with search by name, plus a
+    lightweight typeahead endpoint. ``?include=films`` adds each actor's
+    filmography with one extra query per page.
     """
 
     queryset = Actor.objects.all()
@@ -54,20 +78,185 @@ class ActorViewSet(viewsets.ModelViewSet):
     search_fields = ["first_name", "last_name"]
     ordering_fields = ["actor_id", "first_name", "last_name"]
     ordering = ["last_name", "first_name"]
+    include_prefetches = {
+        "films": lambda: Prefetch(
+            "filmactor_set",
+            queryset=FilmActor.objects.select_related("film")
+            .only("actor_id", "film__film_id", "film__title", "film__release_year")
+            .order_by("film__title"),
+        ),
+    }
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def autocomplete(self, request):
+        """
+        Typeahead suggestions: ``actor_id`` and ``full_name`` of actors whose
+        first or last name contains every word of ``q``.
+
+        Query parameters: ``q`` (2-50 characters) and ``limit`` (1-20, default 10).
+        """
+        params = AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(
+            AutocompleteService.actors(
+                params.validated_data["q"], params.validated_data["limit"]
+            )
+        )
 
 
-class FilmViewSet(viewsets.ModelViewSet):
+class FilmViewSet(IncludeMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Film model.
 
     Provides CRUD operations for film data with search, filter, and ordering.
+    ``?q=`` runs a ranked full-text search on the indexed fulltext column and
+    combines with the rating/year/language filters.
+    ``?include=actors,categories`` adds the cast, prefetched through the
+    film_actor join table (one query per page), and the categories, aggregated
+    from film_category into the film query itself.
+    ``facets/`` returns browse counts for the same filters; ``import/`` bulk
+    loads a CSV/NDJSON release feed (admin only); ``{id}/similar/`` lists
+    precomputed co-rental recommendations.
     Optimized with select_related for language relationships.
     """
 
-    queryset = Film.objects.select_related("language", "original_language").all()
+    # fulltext is only used for matching, never serialized
+    queryset = Film.objects.select_related("language", "original_language").defer("fulltext")
     serializer_class = FilmSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [
+        DjangoFilterBackend,
+        SearchFilter,
+        OrderingFilter,
+        FilmFullTextSearchFilter,
+    ]
     filterset_fields = ["rating", "release_year", "language"]
     search_fields = ["title", "description"]
     ordering_fields = ["film_id", "title", "release_year", "rental_rate"]
     ordering = ["title"]
+    include_prefetches = {
+        "actors": lambda: Prefetch(
+            "filmactor_set",
+            queryset=FilmActor.objects.select_related("actor")
+            .only("film_id", "actor__actor_id", "actor__first_name", "actor__last_name")
+            .order_by("actor__last_name", "actor__first_name"),
+        ),
+    }
+    include_annotations = {
+        # A film has one or two categories: aggregate them into the film row
+        # rather than spend a query on the join table
+        "categories": lambda: {
+            "category_rows": Subquery(
+                FilmCategory.objects.filter(film_id=OuterRef("film_id"))
+                .values("film_id")
+                .annotate(
+                    rows=JSONBAgg(
+                        JSONObject(category_id="category__category_id", name="category__name"),
+                        order_by="category__name",
+                    )
+                )
+                .values("rows"),
+                output_field=JSONField(),
+            )
+        },
+    }
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def autocomplete(self, request):
+        """
+        Typeahead suggestions: ``film_id`` and ``title`` of films whose title
+        contains ``q``, title-prefix matches first.
+
+        Query parameters: ``q`` (2-50 characters) and ``limit`` (1-20, default 10).
+        """
+        params = AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(
+            AutocompleteService.films(
+                params.validated_data["q"], params.validated_data["limit"]
+            )
+        )
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def facets(self, request):
+        """
+        Film counts by rating, release year, language and category for the
+        films matching the list filters (rating, release_year, language,
+        search, q), computed with one GROUPING SETS query and cached per
+        filter combination.
+
+        Query parameters: the list filters plus ``facets`` (comma-separated
+        subset of rating,release_year,language,category; default all).
+        """
+        params = FilmFacetQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        facets = params.validated_data.get("facets", list(FilmFacetService.FACETS))
+
+        # Parameters that change the matching films; paging/ordering do not.
+        ignored = {"facets", "ordering", "page", "page_size", "format", "include"}
+        cache_params = [
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in ignored
+            for value in values
+        ]
+        return Response(
+            FilmFacetService.facets(
+                self.filter_queryset(self.get_queryset()), facets, cache_params
+            )
+        )
+
+    @action(detail=True, methods=["get"], pagination_class=None)
+    def similar(self, request, pk=None):
+        """
+        "Customers who rented this also rented": films most often rented by
+        the same customers, read from the precomputed film_co_rental table
+        (refreshed by ``manage.py build_recommendations``) in one query.
+
+        Query parameters: ``limit`` (1-50, default 10).
+        """
+        params = SimilarFilmQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        try:
+            film_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        return Response(RecommendationService.similar_films(film_id, params.validated_data["limit"]))
+
+    # Content types accepted by import/ and the feed format they map to
+    IMPORT_FORMATS = {
+        "text/csv": "csv",
+        "application/x-ndjson": "ndjson",
+        "application/jsonl": "ndjson",
+    }
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        pagination_class=None,
+    )
+    def bulk_import(self, request):
+        """
+        Bulk load films, cast/category links and inventory from a CSV
+        (``Content-Type: text/csv``) or NDJSON (``application/x-ndjson``)
+        request body through COPY staging tables; see FilmImportService.
+
+        Invalid rows are skipped and reported (first 100) with their line
+        number; valid rows are committed batch by batch.
+        """
+        media_type = (request.content_type or "").split(";")[0].strip().lower()
+        fmt = self.IMPORT_FORMATS.get(media_type)
+        if fmt is None:
+            raise UnsupportedMediaType(media_type)
+
+        # Stream the body line by line instead of parsing it into request.data
+        lines = codecs.iterdecode(request.stream or [], "utf-8")
+        totals = {"rows": 0, "inserted": 0, "updated": 0, "errors": []}
+        for progress in FilmImportService.import_rows(FilmImportService.read_rows(lines, fmt)):
+            for name in ("rows", "inserted", "updated"):
+                totals[name] += progress[name]
+            totals["errors"].extend(progress["errors"])
+        totals["error_count"] = len(totals["errors"])
+        totals["errors"] = totals["errors"][:100]
+        return Response(totals)
@@ -0,0 +1,158 @@
+"""
+In-process lookup cache of the geo hierarchy (address -> city -> country).
+
+Addresses, cities and countries change rarely but are rendered on every
+customer, address, city and store row. Instead of joining them per request,
+serializers read the FK column and resolve names here. The snapshot is loaded
+lazily with one query per table and reloaded when a geo model is saved or
+deleted (through the reference cache version counters), when
+``GEO_HIERARCHY_CACHE_TTL`` expires, so writes made by other worker processes
+become visible, or when an ID is missing from it.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from dvd_rental import reference_cache
+
+from .models import Address, City, Country
+
+MODELS = (Address, City, Country)
+
+# Minimum age of a snapshot before an unknown ID triggers a reload, so
+# requests for dangling IDs cannot reload it on every lookup
+MISS_RELOAD_INTERVAL = 1.0
+
+
+class CityEntry:
+    __slots__ = ("city", "country_id")
+
+    def __init__(self, city, country_id):
+        self.city = city
+        self.country_id = country_id
+
+
+class AddressEntry:
+    __slots__ = ("address", "address2", "district", "city_id", "postal_code", "phone", "last_update")
+
+    FIELDS = __slots__
+
+    def __init__(self, *values):
+        for name, value in zip(self.FIELDS, values, strict=True):
+            setattr(self, name, value)
+
+
+class GeoHierarchy:
+    """One immutable snapshot of the three tables, keyed by primary key."""
+
+    __slots__ = ("countries", "cities", "addresses", "versions", "loaded_at")
+
+    def __init__(self, countries, cities, addresses, versions):
+        self.countries = countries
+        self.cities = cities
+        self.addresses = addresses
+        self.versions = versions
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls):
+        # Read the versions first: a write landing during the load bumps
+        # them again and the next lookup reloads
+        versions = _versions()
+        countries = dict(Country.objects.values_list("country_id", "country"))
+        cities = {
+            city_id: CityEntry(city, country_id)
+            for city_id, city, country_id in City.objects.values_list("city_id", "city", "country_id")
+        }
+        addresses = {
+            row[0]: AddressEntry(*row[1:])
+            for row in Address.objects.values_list("address_id", *AddressEntry.FIELDS)
+        }
+        return cls(countries, cities, addresses, versions)
+
+    def is_current(self):
+        return (
+            self.versions == _versions()
+            and time.monotonic() - self.loaded_at < settings.GEO_HIERARCHY_CACHE_TTL
+        )
+
+    def knows(self, mapping, key):
+        return key in mapping or time.monotonic() - self.loaded_at < MISS_RELOAD_INTERVAL
+
+
+def _versions():
+    return tuple(reference_cache.version(model) for model in MODELS)
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def snapshot():
+    """The current hierarchy, loading it if missing or stale."""
+    current = _snapshot
+    if current is not None and current.is_current():
+        return current
+    return _reload(current)
+
+
+def _reload(stale):
+    global _snapshot
+    with _lock:
+        # Another thread may have reloaded while this one waited
+        if _snapshot is not None and _snapshot is not stale and _snapshot.is_current():
+            return _snapshot
+        _snapshot = GeoHierarchy.load()
+        return _snapshot
+
+
+def clear():
+    """Drop the snapshot; the next lookup reloads it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def _lookup(table, key):
+    current = snapshot()
+    mapping = getattr(current, table)
+    if not current.knows(mapping, key):
+        mapping = getattr(_reload(current), table)
+    return mapping.get(key)
+
+
+def country_name(country_id):
+    return _lookup("countries", country_id)
+
+
+def city(city_id):
+    return _lookup("cities", city_id)
+
+
+def city_name(city_id):
+    entry = city(city_id)
+    return entry.city if entry is not None else None
+
+
+def country_name_for_city(city_id):
+    entry = city(city_id)
+    return country_name(entry.country_id) if entry is not None else None
+
+
+def address(address_id):
+    """An unsaved ``Address`` built from the snapshot, or None if unknown."""
+    entry = _lookup("addresses", address_id)
+    if entry is None:
+        return None
+    return Address(address_id=address_id, **{name: getattr(entry, name) for name in AddressEntry.FIELDS})
+
+
+def address_line(address_id):
+    entry = _lookup("addresses", address_id)
+    return entry.address if entry is not None else None
+
+
+for _model in MODELS:
+    reference_cache.watch(_model)
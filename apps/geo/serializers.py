@@ -1,8 +1,23 @@
 from rest_framework import serializers
 
+from . import hierarchy
 from .models import Address, City, Country, Store
 
 
+class GeoLookupField(serializers.ReadOnlyField):
+    """
+    Read-only field rendering a FK ID (``source="city_id"``) through the
+    in-process geo hierarchy cache instead of a join.
+    """
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.lookup(value)
+
+
 class CountrySerializer(serializers.ModelSerializer):
     """Serializer for Country model"""
 
@@ -15,7 +30,7 @@ class CountrySerializer(serializers.ModelSerializer):
 class CitySerializer(serializers.ModelSerializer):
     """Serializer for City model"""
 
-    country_name = serializers.CharField(source="country.country", read_only=True)
+    country_name = GeoLookupField(hierarchy.country_name, source="country_id")
 
     class Meta:
         model = City
@@ -26,8 +41,8 @@ class CitySerializer(serializers.ModelSerializer):
 class AddressSerializer(serializers.ModelSerializer):
     """Serializer for Address model"""
 
-    city_name = serializers.CharField(source="city.city", read_only=True)
-    country_name = serializers.CharField(source="city.country.country", read_only=True)
+    city_name = GeoLookupField(hierarchy.city_name, source="city_id")
+    country_name = GeoLookupField(hierarchy.country_name_for_city, source="city_id")
 
     class Meta:
         model = Address
@@ -46,10 +61,27 @@ class AddressSerializer(serializers.ModelSerializer):
         read_only_fields = ["address_id", "last_update"]
 
 
+class JoinedAddressSerializer(AddressSerializer):
+    """
+    ``AddressSerializer`` output read from ``select_related("city__country")``
+    instead of the geo hierarchy cache, for single rows that would otherwise
+    load the whole cache.
+    """
+
+    city_name = serializers.CharField(source="city.city", read_only=True)
+    country_name = serializers.CharField(source="city.country.country", read_only=True)
+
+
+def address_info(address_id):
+    """``AddressSerializer`` output for an address, read from the geo hierarchy cache"""
+    address = hierarchy.address(address_id)
+    return AddressSerializer().to_representation(address) if address is not None else None
+
+
 class StoreSerializer(serializers.ModelSerializer):
     """Serializer for Store model"""
 
-    address_info = AddressSerializer(source="address", read_only=True)
+    address_info = GeoLookupField(address_info, source="address_id")
 
     class Meta:
         model = Store
@@ -0,0 +1,150 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from apps.account.views import CustomerViewSet
+from apps.geo import hierarchy
+from apps.geo.models import Address, Country
+from apps.geo.serializers import AddressSerializer, StoreSerializer
+from apps.geo.views import CountryViewSet
+from dvd_rental import reference_cache
+from dvd_rental.reference_cache import LRUCache
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    @patch("dvd_rental.reference_cache.time.monotonic")
+    def test_expired_entries_are_dropped(self, mock_monotonic):
+        cache = LRUCache(max_entries=2, ttl=60)
+        mock_monotonic.return_value = 100
+        cache.set("a", 1)
+
+        mock_monotonic.return_value = 161
+        self.assertIsNone(cache.get("a"))
+
+
+class ReferenceCacheMixinTests(TestCase):
+    def setUp(self):
+        reference_cache.responses.clear()
+        self.factory = APIRequestFactory()
+        self.view = CountryViewSet.as_view({"get": "list"})
+
+    def _get(self, url="/api/countries/"):
+        response = self.view(self.factory.get(url))
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def test_hit_skips_the_database(self):
+        first = self._get()
+
+        with self.assertNumQueries(0):
+            second = self._get()
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Type"], "application/json")
+
+    def test_cached_etag_answers_not_modified_without_queries(self):
+        first = self._get()
+
+        with self.assertNumQueries(0):
+            response = self.view(
+                self.factory.get("/api/countries/", HTTP_IF_NONE_MATCH=first["ETag"])
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_query_params_are_part_of_the_key(self):
+        self._get()
+
+        with self.assertNumQueries(2):
+            self._get("/api/countries/?ordering=-country")
+
+    def test_version_bump_invalidates(self):
+        self._get()
+        reference_cache.bump(Country)
+
+        with self.assertNumQueries(2):
+            self._get()
+
+    def test_save_signal_bumps_version(self):
+        before = reference_cache.version(Country)
+
+        Country.objects.first().save()
+
+        self.assertGreater(reference_cache.version(Country), before)
+
+    def test_browsable_api_is_not_cached(self):
+        self._get("/api/countries/?format=api")
+
+        self.assertEqual(len(reference_cache.responses), 0)
+
+
+class GeoHierarchyTests(TestCase):
+    def setUp(self):
+        hierarchy.clear()
+        self.address = Address.objects.select_related("city__country").first()
+
+    def test_lookups_load_the_hierarchy_once(self):
+        with self.assertNumQueries(3):
+            city_name = hierarchy.city_name(self.address.city_id)
+
+        with self.assertNumQueries(0):
+            country_name = hierarchy.country_name_for_city(self.address.city_id)
+            address_line = hierarchy.address_line(self.address.address_id)
+
+        self.assertEqual(city_name, self.address.city.city)
+        self.assertEqual(country_name, self.address.city.country.country)
+        self.assertEqual(address_line, self.address.address)
+
+    def test_geo_write_reloads(self):
+        hierarchy.city_name(self.address.city_id)
+        self.address.city.save()
+
+        with self.assertNumQueries(3):
+            hierarchy.city_name(self.address.city_id)
+
+    @patch("apps.geo.hierarchy.time.monotonic")
+    def test_unknown_id_reloads_at_most_once_per_interval(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        hierarchy.city_name(self.address.city_id)
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(hierarchy.city_name(-1))
+
+        mock_monotonic.return_value = 100 + hierarchy.MISS_RELOAD_INTERVAL
+        with self.assertNumQueries(3):
+            self.assertIsNone(hierarchy.city_name(-1))
+
+    def test_store_address_info_matches_address_serializer(self):
+        self.assertEqual(
+            StoreSerializer().fields["address_info"].to_representation(self.address.address_id),
+            AddressSerializer(self.address).data,
+        )
+
+    def test_customer_list_only_reads_customer(self):
+        view = CustomerViewSet.as_view({"get": "list"})
+        view(APIRequestFactory().get("/api/customers/"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = view(APIRequestFactory().get("/api/customers/"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            self.assertNotIn("JOIN", query["sql"])
@@ -2,6 +2,8 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 from rest_framework.filters import OrderingFilter, SearchFilter
 
+from dvd_rental.mixins import ConditionalGetMixin, ReferenceCacheMixin, SparseFieldsMixin, ValuesListMixin
+
 from .models import Address, City, Country, Store
 from .serializers import (
     AddressSerializer,
@@ -11,11 +13,14 @@ from .serializers import (
 )
 
 
-class CountryViewSet(viewsets.ModelViewSet):
+class CountryViewSet(
+    ReferenceCacheMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet
+):
     """
     ViewSet for Country model.
 
-    Provides CRUD operations for country data.
+    Provides CRUD operations for country data. Reads are served from the
+    reference-data response cache.
     """
 
     queryset = Country.objects.all()
@@ -26,14 +31,14 @@ class CountryViewSet(viewsets.ModelViewSet):
     ordering = ["country"]
 
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for City model.
 
     Provides CRUD operations for city data with country relationship.
     """
 
-    queryset = City.objects.select_related("country").all()
+    queryset = City.objects.all()
     serializer_class = CitySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["country"]
@@ -42,14 +47,14 @@ class CityViewSet(viewsets.ModelViewSet):
     ordering = ["city"]
 
 
-class AddressViewSet(viewsets.ModelViewSet):
+class AddressViewSet(SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Address model.
 
     Provides CRUD operations for address data with city and country information.
     """
 
-    queryset = Address.objects.select_related("city", "city__country").all()
+    queryset = Address.objects.all()
     serializer_class = AddressSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ["city", "district"]
@@ -58,14 +63,17 @@ class AddressViewSet(viewsets.ModelViewSet):
     ordering = ["address_id"]
 
 
-class StoreViewSet(viewsets.ModelViewSet):
+class StoreViewSet(ReferenceCacheMixin, SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Store model.
 
-    Provides CRUD operations for store data.
+    Provides CRUD operations for store data. Reads are served from the
+    reference-data response cache, which is also invalidated by changes to
+    the nested address, city and country.
     """
 
-    queryset = Store.objects.select_related("address", "address__city").all()
+    queryset = Store.objects.all()
+    reference_cache_models = (Address, City, Country)
     serializer_class = StoreSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     ordering_fields = ["store_id"]
@@ -24,6 +24,16 @@ class RentalAdmin(admin.ModelAdmin):
     list_filter = ("rental_date", "return_date", "staff")
     search_fields = ("customer__first_name", "customer__last_name")
 
+    def get_queryset(self, request):
+        # The related columns the changelist shows, without the staff picture
+        # bytea (select_related bypasses StaffManager's defer)
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("inventory", "customer", "staff")
+            .defer("staff__picture")
+        )
+
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+
+from .models import Payment, Rental
+
+
+class RentalFilter(filters.FilterSet):
+    """Filters for the rental history listing"""
+
+    # Plain ID filters: no lookup query to validate the related row exists.
+    customer = filters.NumberFilter(field_name="customer_id")
+    inventory = filters.NumberFilter(field_name="inventory_id")
+    staff = filters.NumberFilter(field_name="staff_id")
+    store = filters.NumberFilter(field_name="inventory__store_id")
+    rental_date = filters.DateTimeFromToRangeFilter()
+    is_returned = filters.BooleanFilter(method="filter_is_returned")
+
+    class Meta:
+        model = Rental
+        fields = ["customer", "inventory", "staff", "store", "rental_date", "is_returned"]
+
+    def filter_is_returned(self, queryset, name, value):
+        """Open rentals are the ones without a return_date"""
+        return queryset.filter(return_date__isnull=not value)
+
+
+class PaymentFilter(filters.FilterSet):
+    """
+    Filters for the payment listing.
+
+    payment is range-partitioned by payment_date, so listings are always
+    bounded by a date range to let PostgreSQL prune partitions. Without an
+    explicit ``payment_date_after``/``payment_date_before`` (or a selective
+    customer/rental filter) the listing covers the PAYMENT_DEFAULT_WINDOW_DAYS
+    up to the most recent payment.
+    """
+
+    customer_id = filters.NumberFilter()
+    staff_id = filters.NumberFilter()
+    rental_id = filters.NumberFilter()
+    payment_date = filters.DateTimeFromToRangeFilter()
+
+    # Filters that are selective through per-partition indexes on their own.
+    INDEXED_FILTERS = ("customer_id", "rental_id")
+
+    class Meta:
+        model = Payment
+        fields = ["customer_id", "staff_id", "rental_id", "payment_date"]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        date_range = self.form.cleaned_data.get("payment_date")
+        has_date_range = date_range is not None and (
+            date_range.start is not None or date_range.stop is not None
+        )
+        if has_date_range or any(
+            self.form.cleaned_data.get(name) is not None for name in self.INDEXED_FILTERS
+        ):
+            return queryset
+
+        # max() over the (payment_date, payment_id) primary key reads one index
+        # entry per partition.
+        latest = Payment.objects.aggregate(latest=Max("payment_date"))["latest"]
+        if latest is None:
+            return queryset
+        window_start = latest - timedelta(days=settings.PAYMENT_DEFAULT_WINDOW_DAYS)
+        return queryset.filter(payment_date__gte=window_start)
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=`` restricted to what a cursor paginator can page through.
+
+    Each accepted value maps to a unique ordering in the view's
+    ``keyset_orderings``; any other value is rejected with a 400 rather
+    than silently ignored. Without the parameter the paginator's own
+    ordering applies.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param)
+        if param is None:
+            return None
+        ordering = view.keyset_orderings.get(param.strip())
+        if ordering is None:
+            raise ValidationError(
+                {self.ordering_param: [f"Must be one of: {', '.join(view.keyset_orderings)}."]}
+            )
+        return ordering
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        for parameter in parameters:
+            parameter["schema"] = {"type": "string", "enum": list(view.keyset_orderings)}
+        return parameters
@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_key_cutoff():
+    """Keys created before this moment are expired"""
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def idempotent(view_method):
+    """
+    Decorator adding Idempotency-Key support to a ViewSet action.
+
+    The first successful (2xx) response for a key is stored together with a
+    hash of the request body. Retrying with the same key and body replays the
+    stored response without touching the business tables; reusing the key for a
+    different body is rejected with 422. Concurrent requests with the same key
+    are serialized on a Postgres advisory lock, so the view runs only once.
+    Failed requests are not stored, so they can be retried. Keys expire after
+    ``settings.IDEMPOTENCY_KEY_TTL`` seconds and are scoped per ViewSet action.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                {IDEMPOTENCY_KEY_HEADER: f"Must be at most {MAX_KEY_LENGTH} characters."}
+            )
+
+        scope = f"{type(self).__name__}.{view_method.__name__}"
+        request_hash = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        ).hexdigest()
+
+        with transaction.atomic():
+            # Reserve the key before running the view: a concurrent request
+            # with the same key waits here until this transaction ends, then
+            # finds the stored response (or, if this one failed, runs itself).
+            _lock(scope, key)
+            stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if stored is not None and stored.created_at < idempotency_key_cutoff():
+                # Expired but not purged yet: the key may be used again.
+                IdempotencyKey.objects.filter(scope=scope, key=key).delete()
+                stored = None
+            if stored is not None:
+                return _replay(stored, request_hash)
+
+            response = view_method(self, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                IdempotencyKey.objects.create(
+                    scope=scope,
+                    key=key,
+                    request_hash=request_hash,
+                    status_code=response.status_code,
+                    response_body=json.dumps(response.data, cls=DjangoJSONEncoder),
+                    created_at=timezone.now(),
+                )
+        return response
+
+    return wrapper
+
+
+def _lock(scope, key):
+    """Transaction-level advisory lock on (scope, key), released at commit/rollback"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s), hashtext(%s))", [scope, key])
+
+
+def _replay(stored, request_hash):
+    if stored.request_hash != request_hash:
+        return Response(
+            {"detail": "This Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(
+        json.loads(stored.response_body),
+        status=stored.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.operation.idempotency import idempotency_key_cutoff
+from apps.operation.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records older than settings.IDEMPOTENCY_KEY_TTL."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=idempotency_key_cutoff()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.operation.services import BillingService
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute late fees and replacement charges for overdue rentals and "
+        "upsert them into rental_charge. Resumable by customer-ID range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--effective-date", help="ISO datetime to bill as of (default: now).")
+        parser.add_argument("--start-customer", type=int, help="First customer ID (inclusive).")
+        parser.add_argument("--end-customer", type=int, help="Last customer ID (inclusive).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per batch.")
+
+    def handle(self, *args, **options):
+        effective_date = timezone.now()
+        if options["effective_date"]:
+            effective_date = parse_datetime(options["effective_date"])
+            if effective_date is None:
+                raise CommandError("--effective-date must be an ISO datetime.")
+            if timezone.is_naive(effective_date):
+                effective_date = timezone.make_aware(effective_date)
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        total_rows = total_charges = 0
+        started = time.monotonic()
+        for progress in BillingService.run_billing(
+            effective_date=effective_date,
+            start_customer=options["start_customer"],
+            end_customer=options["end_customer"],
+            batch_size=options["batch_size"],
+        ):
+            total_rows += progress["rows"]
+            total_charges += progress["charges"]
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{total_rows} rows, {total_charges} charges, "
+                f"{total_rows / elapsed if elapsed else 0:.0f} rows/s "
+                f"(resume with --start-customer {progress['last_customer_id']})"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Billed {total_charges} charges from {total_rows} overdue rentals "
+                f"in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('pk', models.CompositePrimaryKey('scope', 'key', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('scope', models.TextField()),
+                ('key', models.TextField()),
+                ('request_hash', models.TextField()),
+                ('status_code', models.SmallIntegerField()),
+                ('response_body', models.TextField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'idempotency_key',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalCharge',
+            fields=[
+                ('rental', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, serialize=False, to='operation.rental')),
+                ('customer_id', models.IntegerField()),
+                ('overdue_days', models.IntegerField()),
+                ('late_fee', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('replacement_fee', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('effective_date', models.DateTimeField()),
+                ('billed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'rental_charge',
+                'managed': False,
+            },
+        ),
+    ]
@@ -38,3 +38,32 @@ class Payment(models.Model):
     class Meta:
         managed = False
         db_table = "payment"
+
+
+class IdempotencyKey(models.Model):
+    pk = models.CompositePrimaryKey("scope", "key")
+    scope = models.TextField()
+    key = models.TextField()
+    request_hash = models.TextField()
+    status_code = models.SmallIntegerField()
+    response_body = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "idempotency_key"
+
+
+class RentalCharge(models.Model):
+    rental = models.OneToOneField("operation.Rental", models.DO_NOTHING, primary_key=True)
+    customer_id = models.IntegerField()
+    overdue_days = models.IntegerField()
+    late_fee = models.DecimalField(max_digits=7, decimal_places=2)
+    replacement_fee = models.DecimalField(max_digits=5, decimal_places=2)
+    amount = models.DecimalField(max_digits=7, decimal_places=2)
+    effective_date = models.DateTimeField()
+    billed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "rental_charge"
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RentalCursorPagination(CursorPagination):
+    """
+    Keyset pagination for rental history, newest first.
+
+    Pages are located by (rental_date, rental_id) instead of OFFSET, so the
+    table is never counted and deep pages cost the same as the first one.
+    """
+
+    ordering = ("-rental_date", "-rental_id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class PaymentCursorPagination(CursorPagination):
+    """
+    Keyset pagination for payments, newest first.
+
+    (payment_date, payment_id) is the partitioned table's primary key, so each
+    page is an ordered index scan over only the partitions it touches.
+    """
+
+    ordering = ("-payment_date", "-payment_id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -1,5 +1,8 @@
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from rest_framework import serializers
 
+from dvd_rental.values_plan import full_name
+
 from .models import Inventory, Payment, Rental
 
 
@@ -46,6 +49,16 @@ class RentalSerializer(serializers.ModelSerializer):
             "last_update",
         ]
         read_only_fields = ["rental_id", "last_update"]
+        method_field_sources = {
+            "customer_name": ["customer.first_name", "customer.last_name"],
+            "staff_name": ["staff.first_name", "staff.last_name"],
+            "is_returned": ["return_date"],
+        }
+        values_expressions = {
+            "customer_name": full_name("customer__"),
+            "staff_name": full_name("staff__"),
+            "is_returned": ExpressionWrapper(Q(return_date__isnull=False), output_field=BooleanField()),
+        }
 
     def get_customer_name(self, obj):
         """Get customer full name"""
@@ -74,3 +87,49 @@ class PaymentSerializer(serializers.ModelSerializer):
             "payment_date",
         ]
         read_only_fields = ["payment_id"]
+
+
+class RentalCheckoutSerializer(serializers.Serializer):
+    """Input serializer for renting several inventory items at once"""
+
+    customer_id = serializers.IntegerField()
+    staff_id = serializers.IntegerField()
+    inventory_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
+
+
+class RentAnyCopySerializer(serializers.Serializer):
+    """Input serializer for renting any free copy of a film at a store"""
+
+    film_id = serializers.IntegerField()
+    store_id = serializers.IntegerField()
+    customer_id = serializers.IntegerField()
+    staff_id = serializers.IntegerField()
+
+
+class RentalBulkReturnSerializer(serializers.Serializer):
+    """Input serializer for returning several rentals at once"""
+
+    rental_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+
+
+class InventoryAvailabilityQuerySerializer(serializers.Serializer):
+    """Query parameters for the inventory availability endpoint"""
+
+    film = serializers.CharField(help_text="Comma-separated film IDs, e.g. 1,2,3")
+    store = serializers.IntegerField(required=False)
+
+    def validate_film(self, value):
+        """Parse the comma-separated film IDs"""
+        try:
+            film_ids = sorted({int(part) for part in value.split(",") if part.strip()})
+        except ValueError:
+            raise serializers.ValidationError("Film IDs must be integers.")
+        if not film_ids:
+            raise serializers.ValidationError("At least one film ID is required.")
+        if len(film_ids) > 200:
+            raise serializers.ValidationError("At most 200 film IDs are allowed.")
+        return film_ids
@@ -1,10 +1,26 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Count,
+    DateTimeField,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Value,
+)
 from django.utils import timezone
 
 from apps.account.models import Customer, Staff
+from apps.account.services import CustomerBalanceService
 
-from .models import Inventory, Rental
+from .models import Inventory, Rental, RentalCharge
 
 
 class RentalService:
@@ -14,7 +30,7 @@ class RentalService:
     """
 
     @staticmethod
-    def create_rental(customer_id, inventory_id, staff_id):
+    def create_rental(customer_id, inventory_id, staff_id, single_statement=None):
         """
         Create a new rental record with business logic validation.
 
@@ -22,6 +38,8 @@ class RentalService:
             customer_id (int): ID of the customer renting the item.
             inventory_id (int): ID of the inventory item being rented.
             staff_id (int): ID of the staff member processing the rental.
+            single_statement (bool, optional): Validate and insert in one SQL
+                statement. Defaults to ``settings.RENTAL_SINGLE_STATEMENT_CREATE``.
 
         Returns:
             Rental: The created rental instance.
@@ -29,6 +47,13 @@ class RentalService:
         Raises:
             ValidationError: If customer/inventory invalid or item not available.
         """
+        if single_statement is None:
+            single_statement = settings.RENTAL_SINGLE_STATEMENT_CREATE
+        if single_statement:
+            return RentalService._create_rental_single_statement(
+                customer_id, inventory_id, staff_id
+            )
+
         with transaction.atomic():
             # 1. Validate Customer
             try:
@@ -88,13 +113,280 @@ class RentalService:
                 last_update=now,
             )
             rental.save()
+            CustomerBalanceService.invalidate([customer_id])
             return rental
 
+    @staticmethod
+    def _create_rental_single_statement(customer_id, inventory_id, staff_id):
+        """
+        Validate and insert a rental in one round trip.
+
+        The lookups and the INSERT run as one CTE statement, so no inventory
+        row lock is held across round trips. Double renting is prevented by the
+        unique open-rental index (migrations/006_rental_open_index.sql): a
+        conflicting INSERT is skipped with ON CONFLICT DO NOTHING and reported
+        as "currently rented out", even if the competing rental committed after
+        this statement's snapshot was taken.
+
+        Raises the same field-level ValidationErrors as create_rental().
+        """
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH c AS (
+                    SELECT customer_id, activebool FROM customer WHERE customer_id = %(customer_id)s
+                ), i AS (
+                    SELECT inventory_id FROM inventory WHERE inventory_id = %(inventory_id)s
+                ), s AS (
+                    SELECT staff_id FROM staff WHERE staff_id = %(staff_id)s
+                ), ins AS (
+                    INSERT INTO rental (rental_date, inventory_id, customer_id, staff_id, last_update)
+                    SELECT %(now)s, i.inventory_id, c.customer_id, s.staff_id, %(now)s
+                    FROM c, i, s
+                    WHERE c.activebool
+                    ON CONFLICT (inventory_id) WHERE return_date IS NULL DO NOTHING
+                    RETURNING rental_id, rental_date, inventory_id, customer_id,
+                              return_date, staff_id, last_update
+                )
+                SELECT
+                    EXISTS (SELECT 1 FROM c) AS customer_exists,
+                    COALESCE((SELECT activebool FROM c), false) AS customer_active,
+                    EXISTS (SELECT 1 FROM i) AS inventory_exists,
+                    EXISTS (SELECT 1 FROM s) AS staff_exists,
+                    EXISTS (
+                        SELECT 1 FROM rental
+                        WHERE inventory_id = %(inventory_id)s AND return_date IS NULL
+                    ) AS is_rented,
+                    ins.*
+                FROM (VALUES (1)) AS v
+                LEFT JOIN ins ON true
+                """,
+                {
+                    "customer_id": customer_id,
+                    "inventory_id": inventory_id,
+                    "staff_id": staff_id,
+                    "now": now,
+                },
+            )
+            columns = [col[0] for col in cursor.description]
+            row = dict(zip(columns, cursor.fetchone()))
+
+        # Report failures in the same order as the step-by-step path.
+        if not row.pop("customer_exists"):
+            raise ValidationError(
+                {"customer_id": f"Customer with ID {customer_id} does not exist."}
+            )
+        if not row.pop("customer_active"):
+            raise ValidationError(
+                {"customer_id": "Customer is not active and cannot rent items."}
+            )
+        if not row.pop("inventory_exists"):
+            raise ValidationError(
+                {"inventory_id": f"Inventory item with ID {inventory_id} does not exist."}
+            )
+        staff_exists = row.pop("staff_exists")
+        is_rented = row.pop("is_rented")
+        if row["rental_id"] is None:
+            if is_rented or staff_exists:
+                raise ValidationError(
+                    {"inventory_id": "This inventory item is currently rented out."}
+                )
+            raise ValidationError(
+                {"staff_id": f"Staff with ID {staff_id} does not exist."}
+            )
+
+        CustomerBalanceService.invalidate([customer_id])
+        return Rental(**row)
+
+    @staticmethod
+    def create_rentals(customer_id, inventory_ids, staff_id):
+        """
+        Create rentals for several inventory items in a single checkout.
+
+        All requested inventory rows are locked with one SELECT ... FOR UPDATE
+        ordered by inventory_id, so concurrent checkouts always acquire locks in
+        the same order and cannot deadlock. Availability is checked for all
+        items in one query and the available items are inserted with a single
+        bulk INSERT.
+
+        Args:
+            customer_id (int): ID of the customer renting the items.
+            inventory_ids (list[int]): IDs of the inventory items being rented.
+            staff_id (int): ID of the staff member processing the checkout.
+
+        Returns:
+            list[dict]: One result per requested inventory ID, in request order,
+            with keys ``inventory_id``, ``success``, ``rental`` and ``error``.
+
+        Raises:
+            ValidationError: If the customer or staff member is invalid.
+        """
+        with transaction.atomic():
+            try:
+                customer = Customer.objects.get(pk=customer_id)
+            except Customer.DoesNotExist:
+                raise ValidationError(
+                    {"customer_id": f"Customer with ID {customer_id} does not exist."}
+                )
+
+            if not customer.activebool:
+                raise ValidationError(
+                    {"customer_id": "Customer is not active and cannot rent items."}
+                )
+
+            try:
+                staff = Staff.objects.get(pk=staff_id)
+            except Staff.DoesNotExist:
+                raise ValidationError(
+                    {"staff_id": f"Staff with ID {staff_id} does not exist."}
+                )
+
+            # Lock every requested row in one statement. The ORDER BY makes the
+            # lock acquisition order deterministic across concurrent checkouts.
+            # film is joined so the response can be serialized without extra queries.
+            requested = list(dict.fromkeys(inventory_ids))
+            inventories = {
+                inventory.inventory_id: inventory
+                for inventory in Inventory.objects.select_for_update(of=("self",))
+                .select_related("film")
+                .filter(pk__in=requested)
+                .order_by("inventory_id")
+            }
+
+            rented_ids = set(
+                Rental.objects.filter(
+                    inventory_id__in=inventories.keys(), return_date__isnull=True
+                ).values_list("inventory_id", flat=True)
+            )
+
+            now = timezone.now()
+            results = []
+            to_create = []
+            seen = set()
+            for inventory_id in inventory_ids:
+                result = {
+                    "inventory_id": inventory_id,
+                    "success": False,
+                    "rental": None,
+                    "error": None,
+                }
+                if inventory_id in seen:
+                    result["error"] = "This inventory item is already part of this checkout."
+                elif inventory_id not in inventories:
+                    result["error"] = f"Inventory item with ID {inventory_id} does not exist."
+                elif inventory_id in rented_ids:
+                    result["error"] = "This inventory item is currently rented out."
+                else:
+                    rental = Rental(
+                        rental_date=now,
+                        inventory=inventories[inventory_id],
+                        customer=customer,
+                        staff=staff,
+                        last_update=now,
+                    )
+                    to_create.append(rental)
+                    result["success"] = True
+                    result["rental"] = rental
+                seen.add(inventory_id)
+                results.append(result)
+
+            if to_create:
+                Rental.objects.bulk_create(to_create)
+                CustomerBalanceService.invalidate([customer_id])
+
+            return results
+
+    @staticmethod
+    def rent_any_copy(film_id, store_id, customer_id, staff_id):
+        """
+        Rent any available copy of a film at a store.
+
+        Free copies are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+        concurrent checkouts of the same title each take a different copy
+        instead of queueing on one row lock.
+
+        Args:
+            film_id (int): ID of the film to rent.
+            store_id (int): ID of the store the copy must belong to.
+            customer_id (int): ID of the customer renting the item.
+            staff_id (int): ID of the staff member processing the rental.
+
+        Returns:
+            Rental: The created rental instance.
+
+        Raises:
+            ValidationError: If customer/staff invalid or no copy is available.
+        """
+        with transaction.atomic():
+            try:
+                customer = Customer.objects.get(pk=customer_id)
+            except Customer.DoesNotExist:
+                raise ValidationError(
+                    {"customer_id": f"Customer with ID {customer_id} does not exist."}
+                )
+
+            if not customer.activebool:
+                raise ValidationError(
+                    {"customer_id": "Customer is not active and cannot rent items."}
+                )
+
+            try:
+                staff = Staff.objects.get(pk=staff_id)
+            except Staff.DoesNotExist:
+                raise ValidationError(
+                    {"staff_id": f"Staff with ID {staff_id} does not exist."}
+                )
+
+            open_rentals = Rental.objects.filter(
+                inventory=OuterRef("pk"), return_date__isnull=True
+            )
+            free_copies = (
+                Inventory.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("film")
+                .filter(film_id=film_id, store_id=store_id)
+                .filter(~Exists(open_rentals))
+                .order_by("inventory_id")
+            )
+
+            skipped = []
+            while True:
+                inventory = free_copies.exclude(pk__in=skipped).first()
+                if inventory is None:
+                    raise ValidationError(
+                        {
+                            "film_id": f"No copy of film {film_id} is currently available "
+                            f"at store {store_id}."
+                        }
+                    )
+
+                now = timezone.now()
+                rental = Rental(
+                    rental_date=now,
+                    inventory=inventory,
+                    customer=customer,
+                    staff=staff,
+                    last_update=now,
+                )
+                try:
+                    with transaction.atomic():
+                        rental.save()
+                except IntegrityError:
+                    # The copy was rented by a checkout that committed after this
+                    # query's snapshot; the open-rental unique index rejected it.
+                    skipped.append(inventory.inventory_id)
+                    continue
+                CustomerBalanceService.invalidate([customer_id])
+                return rental
+
     @staticmethod
     def return_rental(rental_id):
         """
         Process the return of a rental.
 
+        The return is a single conditional UPDATE, so two concurrent returns of
+        the same rental cannot both succeed.
+
         Args:
             rental_id (int): ID of the rental to return.
 
@@ -104,17 +396,298 @@ class RentalService:
         Raises:
             ValidationError: If rental not found or already returned.
         """
-        try:
-            rental = Rental.objects.get(pk=rental_id)
-        except Rental.DoesNotExist:
+        returned = RentalService._return_open_rentals([rental_id])
+        if returned:
+            return returned[0]
+
+        # Nothing was updated: find out why (only on the failure path).
+        if not Rental.objects.filter(pk=rental_id).exists():
             raise ValidationError(f"Rental with ID {rental_id} does not exist.")
+        raise ValidationError("This rental has already been returned.")
+
+    @staticmethod
+    def return_rentals(rental_ids):
+        """
+        Process the return of several rentals with one UPDATE statement.
+
+        Args:
+            rental_ids (list[int]): IDs of the rentals to return.
+
+        Returns:
+            list[dict]: One result per requested rental ID, in request order,
+            with keys ``rental_id``, ``success``, ``rental`` and ``error``.
+        """
+        returned = {
+            rental.rental_id: rental
+            for rental in RentalService._return_open_rentals(rental_ids)
+        }
+
+        missing = set(rental_ids) - returned.keys()
+        existing = (
+            set(Rental.objects.filter(pk__in=missing).values_list("rental_id", flat=True))
+            if missing
+            else set()
+        )
 
-        if rental.return_date is not None:
-            raise ValidationError("This rental has already been returned.")
+        results = []
+        for rental_id in rental_ids:
+            rental = returned.pop(rental_id, None)
+            result = {
+                "rental_id": rental_id,
+                "success": rental is not None,
+                "rental": rental,
+                "error": None,
+            }
+            if rental is None:
+                if rental_id in existing:
+                    result["error"] = "This rental has already been returned."
+                else:
+                    result["error"] = f"Rental with ID {rental_id} does not exist."
+            results.append(result)
+        return results
 
+    @staticmethod
+    def _return_open_rentals(rental_ids):
+        """
+        Set return_date on the given rentals that are still open.
+
+        Runs ``UPDATE ... WHERE return_date IS NULL RETURNING ...`` so the check
+        and the write happen atomically in one round trip.
+
+        Returns:
+            list[Rental]: The rentals that were returned by this call.
+        """
         now = timezone.now()
-        rental.return_date = now
-        rental.last_update = now
-        rental.save()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE rental
+                SET return_date = %s, last_update = %s
+                WHERE rental_id = ANY(%s::int[]) AND return_date IS NULL
+                RETURNING rental_id, rental_date, inventory_id, customer_id,
+                          return_date, staff_id, last_update
+                """,
+                [now, now, list(rental_ids)],
+            )
+            columns = [col[0] for col in cursor.description]
+            returned = [Rental(**dict(zip(columns, row))) for row in cursor.fetchall()]
+        CustomerBalanceService.invalidate([rental.customer_id for rental in returned])
+        return returned
+
+
+class InventoryService:
+    """
+    Service layer for Inventory queries.
+    Replaces the per-copy film_in_stock()/inventory_in_stock() database functions
+    with set-based queries.
+    """
+
+    @staticmethod
+    def availability(film_ids, store_id=None):
+        """
+        Count total and in-stock copies for each (film, store) pair.
+
+        A copy is in stock when it has no open rental (return_date IS NULL).
+        All films are handled by one grouped query that probes the partial
+        open-rental index once per copy.
+
+        Args:
+            film_ids (list[int]): IDs of the films to check.
+            store_id (int, optional): Restrict the counts to one store.
+
+        Returns:
+            list[dict]: Rows with ``film_id``, ``store_id``, ``total`` and
+            ``in_stock`` keys, ordered by film and store. Films without any
+            copies are omitted.
+        """
+        open_rentals = Rental.objects.filter(
+            inventory=OuterRef("pk"), return_date__isnull=True
+        )
+        queryset = Inventory.objects.filter(film_id__in=film_ids)
+        if store_id is not None:
+            queryset = queryset.filter(store_id=store_id)
+
+        return list(
+            queryset.values("film_id", "store_id")
+            .annotate(
+                total=Count("inventory_id"),
+                in_stock=Count("inventory_id", filter=~Exists(open_rentals)),
+            )
+            .order_by("film_id", "store_id")
+        )
+
+
+class BillingService:
+    """
+    Service layer for the late-fee billing run.
+    Replaces per-customer get_customer_balance() late-fee scans with one
+    streamed pass over overdue rentals, written back as rental_charge rows.
+    """
+
+    LATE_FEE_PER_DAY = Decimal("1.00")
+    # A film overdue by more than rental_duration * this factor is charged
+    # its replacement cost (same rule as get_customer_balance()).
+    REPLACEMENT_FACTOR = 2
+
+    STREAM_FIELDS = (
+        "rental_id",
+        "customer_id",
+        "rental_date",
+        "return_date",
+        "inventory__film__rental_duration",
+        "inventory__film__replacement_cost",
+    )
+
+    @staticmethod
+    def overdue_rentals(effective_date, start_customer=None, end_customer=None):
+        """
+        Rentals that were late as of ``effective_date``, ordered by customer.
+
+        A rental is late when its due date is before ``effective_date`` and
+        it was not returned by then: it is still open, or was returned after
+        its due date. The due date is ``rental_date + film.rental_duration
+        days``.
 
-        return rental
+        Returns:
+            QuerySet: ``values_list`` rows of ``BillingService.STREAM_FIELDS``.
+        """
+        due_date = ExpressionWrapper(
+            F("rental_date")
+            + ExpressionWrapper(
+                F("inventory__film__rental_duration") * Value(timedelta(days=1)),
+                output_field=DurationField(),
+            ),
+            output_field=DateTimeField(),
+        )
+        queryset = (
+            Rental.objects.filter(rental_date__lte=effective_date)
+            .alias(due_date=due_date)
+            .filter(Q(return_date__isnull=True) | Q(return_date__gt=F("due_date")), due_date__lt=effective_date)
+        )
+        if start_customer is not None:
+            queryset = queryset.filter(customer_id__gte=start_customer)
+        if end_customer is not None:
+            queryset = queryset.filter(customer_id__lte=end_customer)
+        return queryset.order_by("customer_id", "rental_id").values_list(
+            *BillingService.STREAM_FIELDS
+        )
+
+    @staticmethod
+    def compute_charges(rows, effective_date, billed_at=None):
+        """
+        Price one batch of overdue rentals.
+
+        Works column-wise over the batch: overdue days are the whole days
+        between rental and return, capped at ``effective_date`` (a rental
+        returned later was still open then), minus the film's
+        rental_duration; each day costs LATE_FEE_PER_DAY,
+        and rentals overdue by more than REPLACEMENT_FACTOR * rental_duration
+        days are also charged the film's replacement cost.
+
+        Args:
+            rows (list[tuple]): Rows in ``BillingService.STREAM_FIELDS`` order.
+            effective_date (datetime): Date the balance is computed for.
+            billed_at (datetime, optional): Timestamp stored on the charges.
+
+        Returns:
+            list[RentalCharge]: Unsaved charges; rentals late by less than a
+            whole day are skipped.
+        """
+        if not rows:
+            return []
+        billed_at = billed_at or timezone.now()
+        rental_ids, customer_ids, rented, returned, durations, costs = zip(*rows)
+
+        ends = [effective_date if end is None else min(end, effective_date) for end in returned]
+        overdue_days = [
+            max((end - start).days - duration, 0)
+            for start, end, duration in zip(rented, ends, durations)
+        ]
+        late_fees = [BillingService.LATE_FEE_PER_DAY * days for days in overdue_days]
+        replacement_fees = [
+            cost if days > duration * BillingService.REPLACEMENT_FACTOR else Decimal("0.00")
+            for days, duration, cost in zip(overdue_days, durations, costs)
+        ]
+
+        return [
+            RentalCharge(
+                rental_id=rental_id,
+                customer_id=customer_id,
+                overdue_days=days,
+                late_fee=late_fee,
+                replacement_fee=replacement_fee,
+                amount=late_fee + replacement_fee,
+                effective_date=effective_date,
+                billed_at=billed_at,
+            )
+            for rental_id, customer_id, days, late_fee, replacement_fee in zip(
+                rental_ids, customer_ids, overdue_days, late_fees, replacement_fees
+            )
+            if days > 0
+        ]
+
+    @staticmethod
+    def save_charges(charges):
+        """
+        Upsert charges in one INSERT ... ON CONFLICT (rental_id) DO UPDATE.
+
+        Re-billing a rental replaces its previous charge, so a run that is
+        interrupted and restarted never double-charges.
+        """
+        RentalCharge.objects.bulk_create(
+            charges,
+            update_conflicts=True,
+            unique_fields=["rental"],
+            update_fields=[
+                "customer_id",
+                "overdue_days",
+                "late_fee",
+                "replacement_fee",
+                "amount",
+                "effective_date",
+                "billed_at",
+            ],
+        )
+
+    @staticmethod
+    def run_billing(effective_date=None, start_customer=None, end_customer=None, batch_size=5000):
+        """
+        Bill every overdue rental in a customer-ID range.
+
+        Rows are streamed with a server-side cursor (``QuerySet.iterator``)
+        in customer order and priced and upserted ``batch_size`` rows at a
+        time, each batch in its own transaction.
+
+        Args:
+            effective_date (datetime, optional): Defaults to now.
+            start_customer (int, optional): First customer ID (inclusive).
+            end_customer (int, optional): Last customer ID (inclusive).
+            batch_size (int): Rows per batch.
+
+        Yields:
+            dict: Per-batch progress with ``rows``, ``charges`` and
+            ``last_customer_id``. Restarting with
+            ``start_customer=last_customer_id`` resumes the run.
+        """
+        effective_date = effective_date or timezone.now()
+        rows = BillingService.overdue_rentals(effective_date, start_customer, end_customer)
+
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield BillingService._bill_batch(batch, effective_date)
+                batch = []
+        if batch:
+            yield BillingService._bill_batch(batch, effective_date)
+
+    @staticmethod
+    def _bill_batch(batch, effective_date):
+        charges = BillingService.compute_charges(batch, effective_date)
+        with transaction.atomic():
+            BillingService.save_charges(charges)
+        return {
+            "rows": len(batch),
+            "charges": len(charges),
+            "last_customer_id": batch[-1][1],
+        }
@@ -1,19 +1,28 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
 from django.core.exceptions import ValidationError
+from django.db import connection, connections
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APIRequestFactory
+from rest_framework.test import APIClient, APIRequestFactory
 
 from apps.account.models import Customer, Staff
-from apps.operation.models import Inventory, Rental
+from apps.operation.filters import PaymentFilter, RentalFilter
+from apps.operation.models import Inventory, Payment, Rental
 from apps.operation.serializers import (
     InventorySerializer,
     PaymentSerializer,
     RentalSerializer,
 )
-from apps.operation.services import RentalService
-from apps.operation.views import RentalViewSet
+from apps.operation.services import BillingService, RentalService
+from apps.operation.views import InventoryViewSet, PaymentViewSet, RentalViewSet
+from dvd_rental import reference_cache
 
 
 class RentalServiceTests(TestCase):
@@ -108,29 +117,314 @@ class RentalServiceTests(TestCase):
 
         self.assertIn("currently rented out", str(cm.exception))
 
-    @patch("apps.operation.services.Rental.objects.get")
-    def test_return_rental_success(self, mock_rental_get):
-        mock_rental_instance = MagicMock()
-        mock_rental_instance.return_date = None
-        mock_rental_get.return_value = mock_rental_instance
+    def _mock_single_statement_cursor(self, mock_connection, flags, rental_row=None):
+        cursor = mock_connection.cursor.return_value.__enter__.return_value
+        cursor.description = [
+            (name,)
+            for name in (
+                "customer_exists",
+                "customer_active",
+                "inventory_exists",
+                "staff_exists",
+                "is_rented",
+                "rental_id",
+                "rental_date",
+                "inventory_id",
+                "customer_id",
+                "return_date",
+                "staff_id",
+                "last_update",
+            )
+        ]
+        cursor.fetchone.return_value = tuple(flags) + tuple(rental_row or (None,) * 7)
+        return cursor
+
+    @patch("apps.operation.services.connection")
+    def test_create_rental_single_statement_success(self, mock_connection):
+        cursor = self._mock_single_statement_cursor(
+            mock_connection,
+            (True, True, True, True, False),
+            (5, "2023-01-01", 1, 1, None, 1, "2023-01-01"),
+        )
+
+        result = RentalService.create_rental(1, 1, 1, single_statement=True)
+
+        cursor.execute.assert_called_once()
+        self.assertIsInstance(result, Rental)
+        self.assertEqual(result.rental_id, 5)
+        self.assertEqual(result.inventory_id, 1)
+
+    @patch("apps.operation.services.connection")
+    def test_create_rental_single_statement_errors(self, mock_connection):
+        cases = [
+            ((False, False, True, True, False), "Customer with ID 1 does not exist"),
+            ((True, False, True, True, False), "Customer is not active"),
+            ((True, True, False, True, False), "Inventory item with ID 1 does not exist"),
+            # Insert skipped by the open-rental unique index (concurrent rental)
+            ((True, True, True, True, False), "currently rented out"),
+            ((True, True, True, False, True), "currently rented out"),
+            ((True, True, True, False, False), "Staff with ID 1 does not exist"),
+        ]
+        for flags, message in cases:
+            with self.subTest(message=message):
+                self._mock_single_statement_cursor(mock_connection, flags)
+
+                with self.assertRaises(ValidationError) as cm:
+                    RentalService.create_rental(1, 1, 1, single_statement=True)
+
+                self.assertIn(message, str(cm.exception))
+
+    @patch("apps.operation.services.transaction.atomic")
+    @patch("apps.operation.services.Customer.objects.get")
+    @patch("apps.operation.services.Staff.objects.get")
+    @patch("apps.operation.services.Inventory.objects.select_for_update")
+    @patch("apps.operation.services.Rental")
+    def test_create_rentals_partial_success(
+        self,
+        mock_rental_cls,
+        mock_inventory_qs,
+        mock_staff_get,
+        mock_customer_get,
+        mock_atomic,
+    ):
+        mock_atomic.return_value.__enter__.return_value = None
+        mock_customer_get.return_value = self.customer_mock
+        mock_staff_get.return_value = self.staff_mock
+
+        inventory_1 = MagicMock(inventory_id=1)
+        inventory_2 = MagicMock(inventory_id=2)
+        locked_qs = mock_inventory_qs.return_value.select_related.return_value.filter.return_value
+        locked_qs.order_by.return_value = [inventory_1, inventory_2]
+
+        # Inventory 2 is currently rented out
+        mock_rental_cls.objects.filter.return_value.values_list.return_value = [2]
+
+        results = RentalService.create_rentals(1, [2, 1, 3, 1], 1)
+
+        # All rows are locked in a single, ordered statement
+        mock_inventory_qs.assert_called_once_with(of=("self",))
+        locked_qs.order_by.assert_called_once_with("inventory_id")
+        mock_rental_cls.objects.bulk_create.assert_called_once()
+        self.assertEqual(len(mock_rental_cls.objects.bulk_create.call_args[0][0]), 1)
+
+        self.assertEqual([r["inventory_id"] for r in results], [2, 1, 3, 1])
+        self.assertEqual([r["success"] for r in results], [False, True, False, False])
+        self.assertIn("currently rented out", results[0]["error"])
+        self.assertIn("does not exist", results[2]["error"])
+        self.assertIn("already part of this checkout", results[3]["error"])
+
+    @patch("apps.operation.services.transaction.atomic")
+    @patch("apps.operation.services.Customer.objects.get")
+    @patch("apps.operation.services.Staff.objects.get")
+    def test_create_rentals_staff_not_found(
+        self, mock_staff_get, mock_customer_get, mock_atomic
+    ):
+        mock_atomic.return_value.__enter__.return_value = None
+        mock_customer_get.return_value = self.customer_mock
+        mock_staff_get.side_effect = Staff.DoesNotExist
+
+        with self.assertRaises(ValidationError) as cm:
+            RentalService.create_rentals(1, [1, 2], 999)
+
+        self.assertIn("Staff with ID 999 does not exist", str(cm.exception))
+
+    @patch("apps.operation.services.transaction.atomic")
+    @patch("apps.operation.services.Customer.objects.get")
+    @patch("apps.operation.services.Staff.objects.get")
+    @patch("apps.operation.services.Inventory.objects.select_for_update")
+    @patch("apps.operation.services.Rental")
+    def test_rent_any_copy_skips_locked_copies(
+        self,
+        mock_rental_cls,
+        mock_inventory_qs,
+        mock_staff_get,
+        mock_customer_get,
+        mock_atomic,
+    ):
+        mock_atomic.return_value.__enter__.return_value = None
+        mock_customer_get.return_value = self.customer_mock
+        mock_staff_get.return_value = self.staff_mock
+        free_copies = (
+            mock_inventory_qs.return_value.select_related.return_value.filter.return_value
+            .filter.return_value.order_by.return_value
+        )
+        free_copies.exclude.return_value.first.return_value = self.inventory_mock
+
+        result = RentalService.rent_any_copy(1, 2, 1, 1)
+
+        mock_inventory_qs.assert_called_once_with(skip_locked=True, of=("self",))
+        self.assertEqual(result, mock_rental_cls.return_value)
+        mock_rental_cls.return_value.save.assert_called_once()
+
+    @patch("apps.operation.services.transaction.atomic")
+    @patch("apps.operation.services.Customer.objects.get")
+    @patch("apps.operation.services.Staff.objects.get")
+    @patch("apps.operation.services.Inventory.objects.select_for_update")
+    def test_rent_any_copy_none_available(
+        self, mock_inventory_qs, mock_staff_get, mock_customer_get, mock_atomic
+    ):
+        mock_atomic.return_value.__enter__.return_value = None
+        mock_customer_get.return_value = self.customer_mock
+        mock_staff_get.return_value = self.staff_mock
+        free_copies = (
+            mock_inventory_qs.return_value.select_related.return_value.filter.return_value
+            .filter.return_value.order_by.return_value
+        )
+        free_copies.exclude.return_value.first.return_value = None
+
+        with self.assertRaises(ValidationError) as cm:
+            RentalService.rent_any_copy(1, 2, 1, 1)
+
+        self.assertIn("No copy of film 1 is currently available at store 2", str(cm.exception))
+
+    def _mock_returning_cursor(self, mock_connection, rows):
+        cursor = mock_connection.cursor.return_value.__enter__.return_value
+        cursor.description = [
+            (name,)
+            for name in (
+                "rental_id",
+                "rental_date",
+                "inventory_id",
+                "customer_id",
+                "return_date",
+                "staff_id",
+                "last_update",
+            )
+        ]
+        cursor.fetchall.return_value = rows
+        return cursor
+
+    @patch("apps.operation.services.connection")
+    def test_return_rental_success(self, mock_connection):
+        cursor = self._mock_returning_cursor(
+            mock_connection, [(1, "2023-01-01", 2, 3, "2023-01-05", 4, "2023-01-05")]
+        )
 
         result = RentalService.return_rental(1)
 
-        self.assertEqual(result, mock_rental_instance)
-        self.assertIsNotNone(mock_rental_instance.return_date)
-        mock_rental_instance.save.assert_called_once()
+        self.assertIsInstance(result, Rental)
+        self.assertEqual(result.rental_id, 1)
+        self.assertEqual(result.customer_id, 3)
+        self.assertIsNotNone(result.return_date)
+        # Check and write happen in a single conditional UPDATE
+        cursor.execute.assert_called_once()
+        sql, params = cursor.execute.call_args[0]
+        self.assertIn("return_date IS NULL", sql)
+        self.assertIn("RETURNING", sql)
+        self.assertEqual(params[2], [1])
 
-    @patch("apps.operation.services.Rental.objects.get")
-    def test_return_rental_already_returned(self, mock_rental_get):
-        mock_rental_instance = MagicMock()
-        mock_rental_instance.return_date = "2023-01-01"
-        mock_rental_get.return_value = mock_rental_instance
+    @patch("apps.operation.services.Rental.objects.filter")
+    @patch("apps.operation.services.connection")
+    def test_return_rental_already_returned(self, mock_connection, mock_rental_filter):
+        self._mock_returning_cursor(mock_connection, [])
+        mock_rental_filter.return_value.exists.return_value = True
 
         with self.assertRaises(ValidationError) as cm:
             RentalService.return_rental(1)
 
         self.assertIn("already been returned", str(cm.exception))
 
+    @patch("apps.operation.services.Rental.objects.filter")
+    @patch("apps.operation.services.connection")
+    def test_return_rental_not_found(self, mock_connection, mock_rental_filter):
+        self._mock_returning_cursor(mock_connection, [])
+        mock_rental_filter.return_value.exists.return_value = False
+
+        with self.assertRaises(ValidationError) as cm:
+            RentalService.return_rental(999)
+
+        self.assertIn("Rental with ID 999 does not exist", str(cm.exception))
+
+    @patch("apps.operation.services.Rental.objects.filter")
+    @patch("apps.operation.services.connection")
+    def test_return_rentals_bulk(self, mock_connection, mock_rental_filter):
+        cursor = self._mock_returning_cursor(
+            mock_connection, [(2, "2023-01-01", 2, 3, "2023-01-05", 4, "2023-01-05")]
+        )
+        # Rental 1 exists but was already returned, rental 9 does not exist
+        mock_rental_filter.return_value.values_list.return_value = [1]
+
+        results = RentalService.return_rentals([1, 2, 9])
+
+        cursor.execute.assert_called_once()
+        self.assertEqual([r["success"] for r in results], [False, True, False])
+        self.assertEqual(results[1]["rental"].rental_id, 2)
+        self.assertIn("already been returned", results[0]["error"])
+        self.assertIn("does not exist", results[2]["error"])
+
+
+class BillingServiceTests(TestCase):
+    def setUp(self):
+        self.as_of = timezone.make_aware(datetime(2024, 6, 30))
+        self.rented = self.as_of - timedelta(days=20)
+
+    def test_compute_charges_late_return(self):
+        # 3-day film returned after 5 days and a few hours: 2 overdue days
+        row = (1, 10, self.rented, self.rented + timedelta(days=5, hours=3), 3, Decimal("19.99"))
+
+        (charge,) = BillingService.compute_charges([row], self.as_of)
+
+        self.assertEqual(charge.rental_id, 1)
+        self.assertEqual(charge.customer_id, 10)
+        self.assertEqual(charge.overdue_days, 2)
+        self.assertEqual(charge.late_fee, Decimal("2.00"))
+        self.assertEqual(charge.replacement_fee, Decimal("0.00"))
+        self.assertEqual(charge.amount, Decimal("2.00"))
+
+    def test_compute_charges_open_rental_adds_replacement_cost(self):
+        # Still open after 20 days on a 5-day film: 15 days > 2 * 5
+        row = (2, 11, self.rented, None, 5, Decimal("24.99"))
+
+        (charge,) = BillingService.compute_charges([row], self.as_of)
+
+        self.assertEqual(charge.overdue_days, 15)
+        self.assertEqual(charge.late_fee, Decimal("15.00"))
+        self.assertEqual(charge.replacement_fee, Decimal("24.99"))
+        self.assertEqual(charge.amount, Decimal("39.99"))
+        self.assertEqual(charge.effective_date, self.as_of)
+
+    def test_compute_charges_counts_days_up_to_effective_date(self):
+        # Returned 30 days after renting but billed as of day 20 on a 5-day
+        # film: only the 15 days overdue by then are charged
+        row = (4, 13, self.rented, self.rented + timedelta(days=30), 5, Decimal("24.99"))
+
+        (charge,) = BillingService.compute_charges([row], self.as_of)
+
+        self.assertEqual(charge.overdue_days, 15)
+        self.assertEqual(charge.amount, Decimal("39.99"))
+
+    def test_overdue_rentals_due_before_effective_date(self):
+        sql = str(BillingService.overdue_rentals(self.as_of).query)
+        where = sql.split(" WHERE ", 1)[1]
+
+        # Open or returned after the due date, and due before effective_date
+        self.assertIn('("rental"."return_date" IS NULL OR "rental"."return_date" > ("rental"."rental_date" + ', where)
+        self.assertIn('("rental"."rental_date" + ("film"."rental_duration" * 1 day, 0:00:00)) < 2024-06-30', where)
+
+    def test_compute_charges_skips_less_than_a_day_late(self):
+        row = (3, 12, self.rented, self.rented + timedelta(days=3, hours=5), 3, Decimal("9.99"))
+
+        self.assertEqual(BillingService.compute_charges([row], self.as_of), [])
+        self.assertEqual(BillingService.compute_charges([], self.as_of), [])
+
+    @patch("apps.operation.services.BillingService.save_charges")
+    @patch("apps.operation.services.BillingService.overdue_rentals")
+    def test_run_billing_batches_and_reports_resume_point(self, mock_overdue, mock_save):
+        rows = [
+            (rental_id, customer_id, self.rented, None, 3, Decimal("9.99"))
+            for rental_id, customer_id in [(1, 1), (2, 1), (3, 2), (4, 3), (5, 3)]
+        ]
+        mock_overdue.return_value.iterator.return_value = iter(rows)
+
+        progress = list(
+            BillingService.run_billing(self.as_of, start_customer=1, end_customer=3, batch_size=2)
+        )
+
+        mock_overdue.assert_called_once_with(self.as_of, 1, 3)
+        self.assertEqual([p["rows"] for p in progress], [2, 2, 1])
+        self.assertEqual([p["last_customer_id"] for p in progress], [1, 3, 3])
+        self.assertEqual(mock_save.call_count, 3)
+
 
 class RentalViewSetTests(TestCase):
     def setUp(self):
@@ -215,6 +509,29 @@ class RentalViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("inventory_id", response.data)
 
+    @patch("apps.operation.views.RentalService.create_rentals")
+    def test_checkout_action_reports_each_item(self, mock_service):
+        mock_service.return_value = [
+            {"inventory_id": 20, "success": False, "rental": None, "error": "rented"},
+            {"inventory_id": 21, "success": False, "rental": None, "error": "missing"},
+        ]
+        checkout_view = RentalViewSet.as_view(
+            {"post": "checkout"}, **RentalViewSet.checkout.kwargs
+        )
+
+        request = self.factory.post(
+            "/api/rentals/checkout/",
+            {"customer_id": 10, "staff_id": 30, "inventory_ids": [20, 21]},
+            format="json",
+        )
+        response = checkout_view(request)
+
+        mock_service.assert_called_with(customer_id=10, inventory_ids=[20, 21], staff_id=30)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [r["error"] for r in response.data["results"]], ["rented", "missing"]
+        )
+
     @patch("apps.operation.views.RentalService.return_rental")
     def test_return_movie_action_success(self, mock_service):
         # Mock Serializer Class
@@ -252,6 +569,292 @@ class RentalViewSetTests(TestCase):
         self.assertEqual(response.data[0], "Already returned")
 
 
+class RentalReturnTests(TestCase):
+    """Against the real database: the URL pk arrives as a string."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_return_movie_with_url_pk(self):
+        rental = Rental.objects.order_by("rental_id").first()
+        Rental.objects.filter(pk=rental.pk).update(return_date=None)
+
+        response = self.client.post(f"/api/rentals/{rental.pk}/return_movie/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rental_id"], rental.pk)
+        self.assertIsNotNone(Rental.objects.get(pk=rental.pk).return_date)
+
+        response = self.client.post(f"/api/rentals/{rental.pk}/return_movie/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_return_movie_with_non_numeric_pk(self):
+        response = self.client.post("/api/rentals/abc/return_movie/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RentalValuesListTests(TestCase):
+    def test_list_identical_to_serializer_output(self):
+        factory = APIRequestFactory()
+        contents = []
+        for enabled in (True, False):
+            view = RentalViewSet.as_view({"get": "list"}, values_list_enabled=enabled)
+            response = view(factory.get("/api/rentals/"))
+            response.render()
+            contents.append(response.content)
+
+        self.assertEqual(contents[0], contents[1])
+
+
+class RentalConditionalListTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = RentalViewSet.as_view({"get": "list"})
+
+    def _get(self, params=None, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(self.factory.get("/api/rentals/", params or {}, **headers))
+        if hasattr(response, "render"):
+            response.render()
+        return response, [query["sql"] for query in queries]
+
+    def test_list_runs_no_count(self):
+        response, sql = self._get({"page_size": "2"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertEqual(len(sql), 2)
+        self.assertFalse([query for query in sql if "COUNT(" in query.upper()])
+
+        # Deeper pages are validated the same way
+        response, sql = self._get({"page_size": "2", "cursor": response.data["next"].split("cursor=")[1]})
+        self.assertFalse([query for query in sql if "COUNT(" in query.upper()])
+
+    def test_etag_follows_version_counter(self):
+        first, _ = self._get()
+        not_modified, sql = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(sql), 1)
+
+        reference_cache.bump(Rental)
+        response, _ = self._get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+
+class RentalFilterTests(TestCase):
+    def _sql(self, params):
+        return str(RentalFilter(params, queryset=Rental.objects.all()).qs.query)
+
+    def test_open_rentals(self):
+        sql = self._sql({"is_returned": "false"})
+        self.assertIn('"rental"."return_date" IS NULL', sql)
+
+    def test_customer_store_and_date_range(self):
+        sql = self._sql(
+            {
+                "customer": "5",
+                "store": "2",
+                "rental_date_after": "2022-01-01",
+                "rental_date_before": "2022-02-01",
+            }
+        )
+        self.assertIn('"rental"."customer_id" = 5', sql)
+        self.assertIn('"inventory"."store_id" = 2', sql)
+        self.assertIn('"rental"."rental_date" BETWEEN', sql)
+
+    def test_list_uses_keyset_pagination_in_one_query(self):
+        self.assertEqual(
+            RentalViewSet.pagination_class.ordering, ("-rental_date", "-rental_id")
+        )
+        sql = str(RentalViewSet.queryset.query)
+        # Related names come from joins, not per-row lazy loads
+        self.assertIn('INNER JOIN "film"', sql)
+        self.assertIn('INNER JOIN "customer"', sql)
+        self.assertIn('INNER JOIN "staff"', sql)
+        self.assertNotIn('"staff"."picture"', sql)
+
+
+class PaymentFilterTests(TestCase):
+    def _sql(self, params):
+        return str(PaymentFilter(params, queryset=Payment.objects.all()).qs.query)
+
+    @patch("apps.operation.filters.Payment.objects.aggregate")
+    def test_default_window_before_latest_payment(self, mock_aggregate):
+        mock_aggregate.return_value = {"latest": timezone.make_aware(datetime(2022, 7, 31))}
+
+        with self.settings(PAYMENT_DEFAULT_WINDOW_DAYS=31):
+            sql = self._sql({"staff_id": "1"})
+
+        self.assertIn('"payment"."staff_id" = 1', sql)
+        self.assertIn('"payment"."payment_date" >= 2022-06-30', sql)
+
+    @patch("apps.operation.filters.Payment.objects.aggregate")
+    def test_explicit_range_or_indexed_filter_skips_default_window(self, mock_aggregate):
+        sql = self._sql({"payment_date_after": "2022-03-01"})
+        self.assertIn('"payment"."payment_date" >= 2022-03-01', sql)
+
+        sql = self._sql({"customer_id": "5"})
+        self.assertNotIn('"payment_date" >=', sql)
+        mock_aggregate.assert_not_called()
+
+    def test_keyset_pagination_on_primary_key(self):
+        self.assertEqual(
+            PaymentViewSet.pagination_class.ordering, ("-payment_date", "-payment_id")
+        )
+
+    def _list_sql(self, params):
+        view = PaymentViewSet.as_view({"get": "list"})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(APIRequestFactory().get("/api/payments/", params))
+        response.render()
+        return response, queries[-1]["sql"] if queries else ""
+
+    def test_ordering_limited_to_payment_date_direction(self):
+        response, sql = self._list_sql({"customer_id": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ORDER BY 6 DESC, 1 DESC", sql)
+
+        response, sql = self._list_sql({"customer_id": "1", "ordering": "payment_date"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ORDER BY 6 ASC, 1 ASC", sql)
+
+    def test_unsupported_ordering_is_rejected(self):
+        for ordering in ("amount", "-payment_id", "payment_date,amount"):
+            with self.subTest(ordering=ordering):
+                response, _ = self._list_sql({"customer_id": "1", "ordering": ordering})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("ordering", response.data)
+
+
+class InventoryViewSetTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.availability_view = InventoryViewSet.as_view({"get": "availability"})
+
+    @patch("apps.operation.views.InventoryService.availability")
+    def test_availability_parses_film_ids(self, mock_service):
+        mock_service.return_value = [
+            {"film_id": 1, "store_id": 1, "total": 2, "in_stock": 1}
+        ]
+
+        request = self.factory.get(
+            "/api/inventory/availability/", {"film": "3, 1,3", "store": "1"}
+        )
+        response = self.availability_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_service.assert_called_with(film_ids=[1, 3], store_id=1)
+        self.assertEqual(response.data[0]["in_stock"], 1)
+
+    @patch("apps.operation.views.InventoryService.availability")
+    def test_availability_rejects_invalid_film_ids(self, mock_service):
+        request = self.factory.get("/api/inventory/availability/", {"film": "1,abc"})
+        response = self.availability_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("film", response.data)
+        mock_service.assert_not_called()
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.create_view = RentalViewSet.as_view(
+            {"post": "rent_any"}, **RentalViewSet.rent_any.kwargs
+        )
+        self.body = {"film_id": 1, "store_id": 1, "customer_id": 1, "staff_id": 1}
+
+    def _post(self, body, key="retry-1"):
+        request = self.factory.post(
+            "/api/rentals/rent_any/", body, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+        return self.create_view(request)
+
+    @patch("apps.operation.views.RentalSerializer")
+    @patch("apps.operation.views.RentalService.rent_any_copy")
+    @patch("apps.operation.idempotency.IdempotencyKey")
+    def test_first_request_stores_response(
+        self, mock_key_cls, mock_service, mock_serializer_cls
+    ):
+        mock_key_cls.objects.filter.return_value.first.return_value = None
+        mock_serializer_cls.return_value.data = {"rental_id": 7}
+
+        response = self._post(self.body)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_service.assert_called_once()
+        stored = mock_key_cls.objects.create.call_args.kwargs
+        self.assertEqual(stored["scope"], "RentalViewSet.rent_any")
+        self.assertEqual(stored["key"], "retry-1")
+        self.assertEqual(stored["status_code"], 201)
+        self.assertEqual(stored["response_body"], '{"rental_id": 7}')
+
+    @patch("apps.operation.views.RentalService.rent_any_copy")
+    @patch("apps.operation.idempotency.IdempotencyKey")
+    def test_retry_replays_without_calling_service(self, mock_key_cls, mock_service):
+        self._post_and_capture_hash(mock_key_cls)
+        mock_service.reset_mock()
+
+        response = self._post(self.body)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"rental_id": 7})
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        mock_service.assert_not_called()
+
+    @patch("apps.operation.views.RentalService.rent_any_copy")
+    @patch("apps.operation.idempotency.IdempotencyKey")
+    def test_key_reused_with_different_body(self, mock_key_cls, mock_service):
+        self._post_and_capture_hash(mock_key_cls)
+        mock_service.reset_mock()
+
+        response = self._post(dict(self.body, film_id=2))
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        mock_service.assert_not_called()
+
+    @patch("apps.operation.views.RentalSerializer")
+    @patch("apps.operation.views.RentalService.rent_any_copy")
+    @patch("apps.operation.idempotency.IdempotencyKey")
+    def test_concurrent_retries_run_the_view_once(self, mock_key_cls, mock_service, mock_serializer_cls):
+        # Each thread has its own connection, so the advisory lock really
+        # serializes them; the key table itself is faked in memory
+        stored = {}
+        mock_key_cls.objects.filter.return_value.first.side_effect = lambda: stored.get("row")
+        mock_key_cls.objects.create.side_effect = lambda **row: stored.setdefault("row", MagicMock(**row))
+        mock_service.side_effect = lambda **kwargs: time.sleep(0.2)
+        mock_serializer_cls.return_value.data = {"rental_id": 7}
+        responses = []
+
+        def post():
+            try:
+                responses.append(self._post(self.body, key="concurrent-1"))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        mock_service.assert_called_once()
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(sorted(response.has_header("Idempotent-Replayed") for response in responses), [False, True])
+
+    def _post_and_capture_hash(self, mock_key_cls):
+        """Run one request to learn the stored hash, then serve it as stored."""
+        mock_key_cls.objects.filter.return_value.first.return_value = None
+        with patch("apps.operation.views.RentalSerializer") as mock_serializer_cls:
+            mock_serializer_cls.return_value.data = {"rental_id": 7}
+            self._post(self.body)
+        stored = MagicMock(**mock_key_cls.objects.create.call_args.kwargs)
+        stored.created_at = timezone.now()
+        mock_key_cls.objects.filter.return_value.first.return_value = stored
+
+
 class SerializerTests(TestCase):
     def test_inventory_serializer(self):
         # Mock Inventory with related Film and Store
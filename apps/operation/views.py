@@ -1,17 +1,33 @@
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import prefetch_related_objects
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.response import Response
 
-from .models import Inventory, Payment, Rental
-from .serializers import InventorySerializer, PaymentSerializer, RentalSerializer
-from .services import RentalService
-
+from apps.account.services import CustomerBalanceService
+from dvd_rental.mixins import ConditionalGetMixin, ConditionalListMixin, SparseFieldsMixin, ValuesListMixin
 
-class InventoryViewSet(viewsets.ModelViewSet):
+from .filters import KeysetOrderingFilter, PaymentFilter, RentalFilter
+from .idempotency import idempotent
+from .models import Inventory, Payment, Rental
+from .pagination import PaymentCursorPagination, RentalCursorPagination
+from .serializers import (
+    InventoryAvailabilityQuerySerializer,
+    InventorySerializer,
+    PaymentSerializer,
+    RentalBulkReturnSerializer,
+    RentalCheckoutSerializer,
+    RentalSerializer,
+    RentAnyCopySerializer,
+)
+from .services import InventoryService, RentalService
+
+
+class InventoryViewSet(SparseFieldsMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Inventory model.
 
@@ -26,17 +42,54 @@ class InventoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ["inventory_id"]
     ordering = ["inventory_id"]
 
+    @action(detail=False, methods=["get"])
+    def availability(self, request):
+        """
+        In-stock counts for each (film, store) pair of the requested films.
+
+        Query parameters: ``film`` (comma-separated film IDs, required) and
+        ``store`` (optional store ID).
+        """
+        params = InventoryAvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        rows = InventoryService.availability(
+            film_ids=params.validated_data["film"],
+            store_id=params.validated_data.get("store"),
+        )
+        return Response(rows)
 
-class RentalViewSet(viewsets.GenericViewSet):
+
+class RentalViewSet(
+    SparseFieldsMixin, ConditionalListMixin, ValuesListMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+):
     """
     ViewSet for Rental model.
 
-    Only provides create and return operations via Service Layer.
+    Provides a rental history listing (filter by customer, store, date range and
+    returned status, keyset-paginated) plus create, checkout, rent-any-copy and
+    return operations via Service Layer.
     """
 
-    queryset = Rental.objects.all()
+    # Related rows are joined in the same query and trimmed to the columns the
+    # serializer outputs, so a page costs one query whatever its size.
+    queryset = Rental.objects.select_related("inventory__film", "customer", "staff").only(
+        "rental_id",
+        "rental_date",
+        "inventory__film__title",
+        "customer__first_name",
+        "customer__last_name",
+        "return_date",
+        "staff__first_name",
+        "staff__last_name",
+        "last_update",
+    )
     serializer_class = RentalSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = RentalFilter
+    pagination_class = RentalCursorPagination
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         Create a new rental using the Service Layer.
@@ -58,13 +111,73 @@ class RentalViewSet(viewsets.GenericViewSet):
         output_serializer = self.get_serializer(rental)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], serializer_class=RentalCheckoutSerializer)
+    @idempotent
+    def checkout(self, request):
+        """
+        Rent several inventory items for one customer in a single transaction.
+
+        Returns a result for every requested item. The response is 201 if at
+        least one rental was created and 400 if none could be created.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            results = RentalService.create_rentals(
+                customer_id=serializer.validated_data["customer_id"],
+                inventory_ids=serializer.validated_data["inventory_ids"],
+                staff_id=serializer.validated_data["staff_id"],
+            )
+        except DjangoValidationError as e:
+            raise DRFValidationError(
+                e.message_dict if hasattr(e, "message_dict") else e.messages
+            )
+
+        data = [
+            {
+                "inventory_id": result["inventory_id"],
+                "success": result["success"],
+                "rental": RentalSerializer(result["rental"]).data if result["rental"] else None,
+                "error": result["error"],
+            }
+            for result in results
+        ]
+        any_created = any(result["success"] for result in results)
+        return Response(
+            {"results": data},
+            status=status.HTTP_201_CREATED if any_created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=False, methods=["post"], serializer_class=RentAnyCopySerializer)
+    @idempotent
+    def rent_any(self, request):
+        """
+        Rent whichever copy of a film is free at a store.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            rental = RentalService.rent_any_copy(**serializer.validated_data)
+        except DjangoValidationError as e:
+            raise DRFValidationError(
+                e.message_dict if hasattr(e, "message_dict") else e.messages
+            )
+
+        return Response(RentalSerializer(rental).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=["post"])
     def return_movie(self, request, pk=None):
         """
         Custom action to return a rented movie.
         """
         try:
-            rental = RentalService.return_rental(pk)
+            rental_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        try:
+            rental = RentalService.return_rental(rental_id)
         except DjangoValidationError as e:
             raise DRFValidationError(
                 e.message_dict if hasattr(e, "message_dict") else e.messages
@@ -73,17 +186,70 @@ class RentalViewSet(viewsets.GenericViewSet):
         serializer = self.get_serializer(rental)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"], serializer_class=RentalBulkReturnSerializer)
+    def bulk_return_movie(self, request):
+        """
+        Return several rented movies at once (e.g. a drop-box scan).
 
-class PaymentViewSet(viewsets.ModelViewSet):
+        All rentals are processed by one UPDATE statement and a result is
+        reported for every requested rental ID.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = RentalService.return_rentals(serializer.validated_data["rental_ids"])
+
+        rentals = [result["rental"] for result in results if result["rental"]]
+        prefetch_related_objects(rentals, "customer", "staff", "inventory__film")
+
+        data = [
+            {
+                "rental_id": result["rental_id"],
+                "success": result["success"],
+                "rental": RentalSerializer(result["rental"]).data if result["rental"] else None,
+                "error": result["error"],
+            }
+            for result in results
+        ]
+        return Response({"results": data})
+
+
+class PaymentViewSet(SparseFieldsMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Payment model.
 
-    Provides CRUD operations for payment data.
+    Provides CRUD operations for payment data. The listing is bounded by a
+    payment_date range (defaulted when not given) so only the matching monthly
+    partitions are scanned, and is keyset-paginated newest first
+    (``?ordering=payment_date`` for oldest first; other orderings are a 400).
     """
 
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ["customer_id", "staff_id", "rental_id"]
-    ordering_fields = ["payment_id", "payment_date", "amount"]
-    ordering = ["-payment_date"]
+    filter_backends = [DjangoFilterBackend, KeysetOrderingFilter]
+    filterset_class = PaymentFilter
+    pagination_class = PaymentCursorPagination
+    keyset_orderings = {
+        "-payment_date": ("-payment_date", "-payment_id"),
+        "payment_date": ("payment_date", "payment_id"),
+    }
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """
+        Create a payment; safe to retry with an Idempotency-Key header.
+        """
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        CustomerBalanceService.invalidate([serializer.instance.customer_id])
+
+    def perform_update(self, serializer):
+        previous_customer_id = serializer.instance.customer_id
+        super().perform_update(serializer)
+        CustomerBalanceService.invalidate([previous_customer_id, serializer.instance.customer_id])
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        CustomerBalanceService.invalidate([instance.customer_id])
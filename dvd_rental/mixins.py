@@ -0,0 +1,457 @@
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from dvd_rental import reference_cache
+from dvd_rental.values_plan import ValuesPlan, is_column, resolve_path
+
+
+class IncludeMixin:
+    """
+    ViewSet mixin for optional related data via ``?include=a,b``.
+
+    Subclasses map each include name to a callable returning the Prefetch (or
+    lookup) that loads it, so a page costs one extra query per include instead
+    of one per row:
+
+        include_prefetches = {"actors": lambda: Prefetch("filmactor_set", ...)}
+
+    Small related sets can instead come with the main query, as annotations
+    (e.g. a JSON aggregate subquery) that add no query at all:
+
+        include_annotations = {"categories": lambda: {"category_rows": Subquery(...)}}
+
+    The requested names are passed to the serializer context as ``include``
+    for serializers using IncludeFieldsMixin.
+    """
+
+    include_param = "include"
+    include_prefetches = {}
+    include_annotations = {}
+
+    def get_includes(self):
+        if not hasattr(self, "_includes"):
+            raw = self.request.query_params.get(self.include_param, "") if self.request else ""
+            includes = {name.strip() for name in raw.split(",") if name.strip()}
+            allowed = self.include_prefetches.keys() | self.include_annotations.keys()
+            unknown = includes - allowed
+            if unknown:
+                raise ValidationError(
+                    {
+                        self.include_param: [
+                            f"Unknown include(s): {', '.join(sorted(unknown))}. "
+                            f"Allowed: {', '.join(sorted(allowed))}."
+                        ]
+                    }
+                )
+            self._includes = includes
+        return self._includes
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for name in sorted(self.get_includes()):
+            if name in self.include_annotations:
+                queryset = queryset.annotate(**self.include_annotations[name]())
+            else:
+                queryset = queryset.prefetch_related(self.include_prefetches[name]())
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include"] = self.get_includes()
+        return context
+
+
+class IncludeFieldsMixin:
+    """
+    Serializer mixin that drops the fields listed in ``Meta.include_fields``
+    unless they were requested through the ``include`` context (IncludeMixin).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("include", set())
+        for name in getattr(self.Meta, "include_fields", ()):
+            if name not in requested:
+                self.fields.pop(name, None)
+
+
+class SparseFieldsMixin:
+    """
+    ViewSet mixin for sparse fieldsets via ``?fields=a,b`` on list/retrieve.
+
+    The serializer output is trimmed to the requested fields, and the queryset
+    is narrowed to the columns and joins those fields read: ``only()`` on the
+    model and related-model columns, ``select_related`` for the relations
+    traversed by dotted sources and nested serializers. Without ``fields``
+    the projection still covers exactly the serializer's readable fields, so
+    columns the serializer never outputs (e.g. bytea, tsvector) are not
+    fetched.
+
+    Sources are read from each serializer field; SerializerMethodFields
+    declare theirs in ``Meta.method_field_sources`` (dotted paths, empty for
+    values served by a prefetch or an annotation):
+
+        method_field_sources = {"full_name": ["first_name", "last_name"]}
+
+    If any field cannot be resolved to model columns the queryset is left
+    as it is and only the output is trimmed.
+    """
+
+    fields_param = "fields"
+    sparse_actions = ("list", "retrieve")
+
+    def get_sparse_fields(self):
+        """Requested field names in request order, or None for all fields."""
+        if not hasattr(self, "_sparse_fields"):
+            raw = self.request.query_params.get(self.fields_param, "") if self.request else ""
+            names = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+            if names:
+                available = self._readable_fields()
+                unknown = set(names) - available.keys()
+                if unknown:
+                    raise ValidationError(
+                        {
+                            self.fields_param: [
+                                f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                                f"Allowed: {', '.join(available)}."
+                            ]
+                        }
+                    )
+            self._sparse_fields = names or None
+        return self._sparse_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions:
+            return queryset
+        fields = self._readable_fields()
+        requested = self.get_sparse_fields()
+        if requested:
+            fields = {name: fields[name] for name in requested}
+        projection = _projection(queryset.model, fields.values())
+        if projection is None:
+            return queryset
+        only, related = projection
+        # Cursor pagination reads its ordering fields from the page's rows
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        only.extend(name.lstrip("-") for name in ordering)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_sparse_fields() if self.action in self.sparse_actions else None
+        if requested:
+            target = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+            for name in list(target.fields):
+                if name not in requested:
+                    target.fields.pop(name)
+        return serializer
+
+    def _readable_fields(self):
+        if not hasattr(self, "_readable_field_map"):
+            serializer = self.get_serializer_class()(context=self.get_serializer_context())
+            self._readable_field_map = {
+                name: field for name, field in serializer.fields.items() if not field.write_only
+            }
+        return self._readable_field_map
+
+
+def _projection(model, fields, prefix=""):
+    """
+    ``(only paths, select_related paths)`` covering what ``fields`` read from
+    ``model`` instances, or None if some field's source cannot be resolved.
+    """
+    only, related = [], []
+    for field in fields:
+        if isinstance(field, serializers.SerializerMethodField):
+            sources = getattr(getattr(field.parent, "Meta", None), "method_field_sources", {})
+            if field.field_name not in sources:
+                return None
+            paths = [source.split(".") for source in sources[field.field_name]]
+        elif field.source == "*" or isinstance(field, serializers.ListSerializer):
+            return None
+        else:
+            paths = [field.source_attrs]
+
+        for path in paths:
+            resolved = resolve_path(model, path, nested=isinstance(field, serializers.BaseSerializer))
+            if resolved is None:
+                return None
+            target, joins = resolved
+            related.extend(prefix + "__".join(path[: depth + 1]) for depth in range(joins))
+            if isinstance(field, serializers.BaseSerializer):
+                nested = _projection(
+                    target, field.fields.values(), prefix=prefix + "__".join(path) + "__"
+                )
+                if nested is None:
+                    return None
+                only.extend(nested[0])
+                related.extend(nested[1])
+            elif is_column(target, path[-1]) or isinstance(field, serializers.PrimaryKeyRelatedField):
+                # A plain column, or a FK rendered as its ID (read from the attname)
+                only.append(prefix + "__".join(path))
+            else:
+                return None
+    if prefix and not only:
+        # Keep the relation loaded even if no column of it was requested.
+        only.append(prefix + model._meta.pk.name)
+    return list(dict.fromkeys(only)), list(dict.fromkeys(related))
+
+
+class ValuesListMixin:
+    """
+    ViewSet mixin serving ``list`` from ``QuerySet.values()`` dicts rendered
+    by a ValuesPlan compiled from the (sparse-trimmed) serializer, skipping
+    model instantiation and per-row attribute lookups. The output is the
+    same as the serializer's; requests the plan cannot express (e.g. an
+    ``include`` served by a prefetch) fall back to the regular list.
+
+    Set ``values_list_enabled = False`` to turn it off for a viewset.
+    """
+
+    values_list_enabled = True
+
+    def get_values_plan(self):
+        if not self.values_list_enabled:
+            return None
+        return ValuesPlan.compile(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        # Cursor pagination reads its ordering fields from the page's rows
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        rows = plan.queryset(
+            self.filter_queryset(self.get_queryset()),
+            extra=[name.lstrip("-") for name in ordering],
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([plan.render(row) for row in page])
+        return Response([plan.render(row) for row in rows])
+
+
+class ReferenceCacheMixin:
+    """
+    ViewSet mixin serving list/retrieve from an in-process cache of rendered
+    JSON responses (dvd_rental.reference_cache).
+
+    Meant for small, rarely-changing reference tables: a hit returns the
+    stored bytes without touching the database. Entries are keyed by the URL
+    and query parameters plus the version counters of the viewset's model and
+    of ``reference_cache_models`` (other models rendered in the response).
+    Versions are bumped by this viewset's writes and by post_save/post_delete
+    signals; REFERENCE_CACHE_TTL bounds staleness for writes made by other
+    processes.
+    """
+
+    reference_cache_models = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for model in cls._reference_models():
+            reference_cache.watch(model)
+
+    @classmethod
+    def _reference_models(cls):
+        models = list(cls.reference_cache_models)
+        if getattr(cls, "queryset", None) is not None:
+            models.insert(0, cls.queryset.model)
+        return models
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def _cached_response(self, view, request, *args, **kwargs):
+        # The browsable API embeds per-user forms; only cache plain JSON.
+        if request.accepted_renderer.format != "json":
+            return view(request, *args, **kwargs)
+
+        key = (
+            type(self).__name__,
+            request.get_host(),
+            request.is_secure(),
+            request.path,
+            tuple(sorted((name, tuple(values)) for name, values in request.query_params.lists())),
+            tuple(reference_cache.version(model) for model in self._reference_models()),
+        )
+        cached = reference_cache.responses.get(key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+            # Validators set by ConditionalGetMixin are cached with the body,
+            # so a matching If-None-Match gets its 304 without a query.
+            return get_conditional_response(request, etag=headers.get("ETag"), response=response)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+
+            def store(rendered):
+                headers = {
+                    name: rendered[name]
+                    for name in ("Content-Type", "ETag", "Last-Modified")
+                    if rendered.has_header(name)
+                }
+                reference_cache.responses.set(key, (rendered.content, headers))
+
+            response.add_post_render_callback(store)
+        return response
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        reference_cache.bump(self.queryset.model)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        reference_cache.bump(self.queryset.model)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        reference_cache.bump(self.queryset.model)
+
+
+class BaseConditionalMixin:
+    """
+    Shared validator logic for ConditionalListMixin/ConditionalRetrieveMixin.
+
+    Validators come from one aggregate over the (filtered) queryset,
+    ``max(last_update)`` and ``count(*)``, computed before any row is
+    fetched; a matching precondition returns 304 without running the real
+    query or serializing. The ETag also covers the request URL (page,
+    ordering, include, cursor, ...) and the response format.
+
+    Only the viewset's own table is considered: a change to a related row
+    that is rendered nested (e.g. a language name) does not change the ETag.
+    """
+
+    conditional_last_update_field = "last_update"
+
+    def get_validators(self, request, queryset, count=True):
+        """
+        Return ``(etag, last_modified, count)`` for ``queryset``.
+
+        With ``count=False`` no ``count(*)`` is run (``count`` is None): the
+        ETag uses the model's reference_cache version counter instead, which
+        notices deletes made through the ORM in this process.
+        """
+        aggregates = {"last_modified": Max(self.conditional_last_update_field)}
+        if count:
+            aggregates["count"] = Count("*")
+        state = queryset.order_by().aggregate(**aggregates)
+        last_modified = state["last_modified"]
+        etag_source = "|".join(
+            [
+                request.get_host(),
+                request.get_full_path(),
+                request.accepted_renderer.format,
+                last_modified.isoformat() if last_modified else "",
+                str(state["count"]) if count else f"v{reference_cache.version(queryset.model)}",
+            ]
+        )
+        etag = f'"{hashlib.md5(etag_source.encode()).hexdigest()}"'
+        return etag, last_modified, state.get("count")
+
+    def conditional_response(self, view, request, etag, last_modified, *args, **kwargs):
+        """
+        304 if the request's preconditions match, otherwise ``view``'s response
+        with the validators set. Pass ``last_modified=None`` to match on the
+        ETag only.
+        """
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+
+class ConditionalListMixin(BaseConditionalMixin):
+    """
+    ViewSet mixin adding ETag/Last-Modified validators to ``list``.
+
+    Cursor-paginated lists never count their rows, so neither do their
+    validators: the ETag is built from the cursor in the URL,
+    ``max(last_update)`` and the model's version counter, bumped by
+    post_save/post_delete.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls._is_cursor_paginated() and getattr(cls, "queryset", None) is not None:
+            reference_cache.watch(cls.queryset.model)
+
+    @classmethod
+    def _is_cursor_paginated(cls):
+        pagination_class = getattr(cls, "pagination_class", None)
+        return isinstance(pagination_class, type) and issubclass(pagination_class, CursorPagination)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified, count = self.get_validators(
+            request, self.filter_queryset(self.get_queryset()), count=not self._is_cursor_paginated()
+        )
+        # Reused by dvd_rental.pagination.PageNumberPagination instead of a
+        # second COUNT(*).
+        self.known_count = count
+
+        def respond(*args, **kwargs):
+            response = super(ConditionalListMixin, self).list(*args, **kwargs)
+            if last_modified and response.status_code == 200:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+            return response
+
+        # Lists are only matched on ETag: If-Modified-Since cannot notice a
+        # deleted row, the count or version counter in the ETag can.
+        return self.conditional_response(respond, request, etag, None, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(BaseConditionalMixin):
+    """ViewSet mixin adding ETag/Last-Modified validators to ``retrieve``."""
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            # A lookup value of the wrong type (e.g. /films/abc/) is a 404,
+            # as in DRF's get_object_or_404
+            raise Http404
+        etag, last_modified, _ = self.get_validators(request, queryset)
+        return self.conditional_response(
+            super().retrieve, request, etag, last_modified, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin(ConditionalListMixin, ConditionalRetrieveMixin):
+    """ETag/Last-Modified validators on both ``list`` and ``retrieve``."""
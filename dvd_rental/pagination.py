@@ -0,0 +1,28 @@
+from django.core.paginator import Paginator
+from rest_framework import pagination
+
+
+class KnownCountPaginator(Paginator):
+    """Paginator that can be given the object count instead of querying it."""
+
+    def __init__(self, object_list, per_page, known_count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if known_count is not None:
+            # Pre-fill the cached_property so no COUNT(*) is issued.
+            self.__dict__["count"] = known_count
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    Default page-number pagination.
+
+    Reuses ``view.known_count`` (set by ConditionalListMixin, which already
+    counted the filtered queryset for its ETag) instead of a second COUNT(*).
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        known_count = getattr(view, "known_count", None)
+        self.django_paginator_class = lambda *args, **kwargs: KnownCountPaginator(
+            *args, known_count=known_count, **kwargs
+        )
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,90 @@
+"""
+In-process cache of rendered responses for small reference tables.
+
+Entries are keyed by the request and by a version counter per model; saving
+or deleting a watched model bumps its counter, so every response built from
+the old data stops matching and ages out of the LRU.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with a size bound and per-entry expiry."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+responses = LRUCache(settings.REFERENCE_CACHE_MAX_ENTRIES, settings.REFERENCE_CACHE_TTL)
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def version(model):
+    """Current version counter of ``model``."""
+    return _versions.get(model._meta.label, 0)
+
+
+def _increment(label):
+    with _versions_lock:
+        _versions[label] = _versions.get(label, 0) + 1
+
+
+def bump(model):
+    """
+    Invalidate every cached response built from ``model``.
+
+    Bumped again on commit, so a response rendered by another request from
+    the pre-commit data is not kept under the new version.
+    """
+    label = model._meta.label
+    _increment(label)
+    transaction.on_commit(lambda: _increment(label))
+
+
+def _bump_on_change(sender, **kwargs):
+    bump(sender)
+
+
+def watch(model):
+    """Bump ``model``'s version whenever an instance is saved or deleted."""
+    uid = f"reference_cache:{model._meta.label}"
+    post_save.connect(_bump_on_change, sender=model, dispatch_uid=uid)
+    post_delete.connect(_bump_on_change, sender=model, dispatch_uid=uid)
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third-party apps
     "rest_framework",
     "django_filters",
@@ -148,7 +149,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     # Pagination
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "dvd_rental.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     # Filtering, Searching, Ordering
     "DEFAULT_FILTER_BACKENDS": [
@@ -169,11 +170,63 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
+    # Authentication (DRF's defaults plus the login tokens)
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+        "apps.account.authentication.SignedTokenAuthentication",
+    ],
     # Date/Time formatting
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M:%S",
     "DATE_FORMAT": "%Y-%m-%d",
 }
 
+# Rental creation: validate and insert in a single SQL statement
+# (shorter lock hold time; relies on migrations/006_rental_open_index.sql)
+RENTAL_SINGLE_STATEMENT_CREATE = os.getenv("RENTAL_SINGLE_STATEMENT_CREATE", "False") == "True"
+
+# Idempotency-Key retention in seconds (see migrations/008_idempotency_key.sql)
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# Payment listings without an explicit payment_date range cover this many
+# days up to the latest payment (keeps partition pruning effective)
+PAYMENT_DEFAULT_WINDOW_DAYS = int(os.getenv("PAYMENT_DEFAULT_WINDOW_DAYS", "31"))
+
+# Cache (use a shared backend such as Redis when running several workers,
+# so balance invalidation reaches every process)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Upper bound on how long a cached customer balance is served; balances are
+# also invalidated on every rental, return and payment.
+CUSTOMER_BALANCE_CACHE_TTL = int(os.getenv("CUSTOMER_BALANCE_CACHE_TTL", "3600"))
+
+# How long typeahead (autocomplete) results are cached per query, in seconds
+AUTOCOMPLETE_CACHE_TTL = int(os.getenv("AUTOCOMPLETE_CACHE_TTL", "60"))
+
+# How long film facet counts are cached per filter combination, in seconds
+FILM_FACETS_CACHE_TTL = int(os.getenv("FILM_FACETS_CACHE_TTL", "300"))
+
+# In-process response cache for reference tables (Language, Category,
+# Country, Store): entry bound, and max age so writes made by other worker
+# processes become visible
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "512"))
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+# Max age of the in-process address -> city -> country lookup cache, so geo
+# writes made by other worker processes become visible
+GEO_HIERARCHY_CACHE_TTL = int(os.getenv("GEO_HIERARCHY_CACHE_TTL", "300"))
+
+# Login: bcrypt verification processes, logins admitted per server process
+# while they wait for one (the rest get 429), and token lifetime in seconds
+LOGIN_HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", "2"))
+LOGIN_MAX_PENDING = int(os.getenv("LOGIN_MAX_PENDING", "16"))
+LOGIN_TOKEN_TTL = int(os.getenv("LOGIN_TOKEN_TTL", "3600"))
+
 # DRF Spectacular Configuration (OpenAPI/Swagger)
 # Custom Test Runner to handle managed=False models
 TEST_RUNNER = "dvd_rental.test_runner.ExistingDBTestRunner"
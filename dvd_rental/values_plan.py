@@ -0,0 +1,197 @@
+"""
+Serializer output straight from ``QuerySet.values()``.
+
+``ValuesPlan.compile(serializer)`` turns a ModelSerializer's readable fields
+into a values() projection (lookup paths, plus SQL expressions for
+SerializerMethodFields) and a renderer producing the same dicts as
+``serializer.to_representation`` would, without instantiating models.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Func, TextField, Value
+from django.db.models.functions import Concat
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.relations import PKOnlyObject
+
+
+def resolve_path(model, path, nested=False):
+    """
+    Walk ``path`` through forward FK/one-to-one fields. Returns the model
+    owning the last attribute (the related model itself when ``nested``) and
+    the number of relations traversed, or None for anything else.
+    """
+    joins = len(path) if nested else len(path) - 1
+    for depth, name in enumerate(path):
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            return None
+        if depth < joins:
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return None
+            model = model_field.related_model
+    return model, joins
+
+
+def is_column(model, name):
+    """Whether ``name`` reads a plain column: a non-relation field or a FK attname."""
+    model_field = model._meta.get_field(name)
+    return not model_field.is_relation or name == model_field.attname
+
+
+class ValuesPlan:
+    """
+    A compiled serializer: ``values`` holds the positional lookups and
+    ``expressions`` the aliased SQL expressions to pass to values();
+    ``render(row)`` builds one representation from a values() dict.
+
+    SerializerMethodFields need a SQL equivalent in
+    ``Meta.values_expressions`` (relative to the serializer's model):
+
+        values_expressions = {"full_name": full_name()}
+    """
+
+    # Fields that need the model instance (or a queryset) to render
+    UNSUPPORTED_FIELDS = (
+        serializers.ListSerializer,
+        serializers.ManyRelatedField,
+        serializers.ModelField,
+    )
+
+    def __init__(self):
+        self.values = []
+        self.expressions = {}
+        self._render = None
+
+    @classmethod
+    def compile(cls, serializer):
+        """The plan for ``serializer``, or None if a field is not supported."""
+        plan = cls()
+        plan._render = plan._compile(serializer, serializer.Meta.model, prefix="")
+        if plan._render is None:
+            return None
+        plan.values = list(dict.fromkeys(plan.values))
+        return plan
+
+    def queryset(self, queryset, extra=()):
+        """``queryset.values()`` with this plan's columns plus ``extra``."""
+        return queryset.values(*dict.fromkeys([*self.values, *extra]), **self.expressions)
+
+    def render(self, row):
+        return self._render(row)
+
+    def _compile(self, serializer, model, prefix):
+        getters = []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            getter = self._compile_field(field, model, prefix)
+            if getter is None:
+                return None
+            getters.append((field.field_name, getter))
+
+        def render(row):
+            data = {}
+            for name, getter in getters:
+                try:
+                    data[name] = getter(row)
+                except SkipField:
+                    pass
+            return data
+
+        return render
+
+    def _compile_field(self, field, model, prefix):
+        if isinstance(field, serializers.SerializerMethodField):
+            expression = getattr(field.parent.Meta, "values_expressions", {}).get(field.field_name)
+            if expression is None or prefix:
+                return None
+            alias = f"values_expression_{len(self.expressions)}"
+            self.expressions[alias] = expression
+            return lambda row: row[alias]
+
+        nested = isinstance(field, serializers.BaseSerializer)
+        if field.source == "*" or isinstance(field, self.UNSUPPORTED_FIELDS):
+            return None
+        if isinstance(field, serializers.RelatedField) and not isinstance(
+            field, serializers.PrimaryKeyRelatedField
+        ):
+            return None
+        path = field.source_attrs
+        resolved = resolve_path(model, path, nested=nested)
+        if resolved is None:
+            return None
+        target, _ = resolved
+        key = prefix + "__".join(path)
+
+        # Intermediate relations that may be NULL, which the serializer
+        # reports through Field.get_attribute's AttributeError handling
+        parents = []
+        for depth in range(len(path) - 1):
+            parent = prefix + "__".join(path[: depth + 1])
+            parents.append(parent)
+            self.values.append(parent)
+        if parents and field.default is empty and not field.allow_null and field.required:
+            return None
+
+        def missing():
+            if field.default is not empty:
+                return field.get_default()
+            if field.allow_null:
+                return None
+            raise SkipField()
+
+        if nested:
+            convert = self._compile(field, target, key + "__")
+            if convert is None:
+                return None
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            convert = lambda value: field.to_representation(PKOnlyObject(pk=value))  # noqa: E731
+        elif is_column(target, path[-1]):
+            convert = field.to_representation
+        else:
+            return None
+        # For nested serializers this is the FK column, telling whether the
+        # related row exists
+        self.values.append(key)
+
+        def getter(row):
+            for parent in parents:
+                if row[parent] is None:
+                    return missing()
+            value = row[key]
+            if value is None:
+                return None
+            return convert(row) if nested else convert(value)
+
+        return getter
+
+
+# The characters str.strip() removes (those where str.isspace() is true)
+WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005"
+    "\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+
+
+def strip(expression):
+    """
+    SQL equivalent of ``str.strip()``: TRIM() only removes spaces, this
+    removes every leading and trailing character in WHITESPACE.
+    """
+    return Func(
+        expression,
+        Value(f"^[{WHITESPACE}]+|[{WHITESPACE}]+$"),
+        Value(""),
+        Value("g"),
+        function="regexp_replace",
+        output_field=TextField(),
+    )
+
+
+def full_name(prefix=""):
+    """SQL equivalent of ``f"{obj.first_name} {obj.last_name}".strip()``."""
+    return strip(Concat(f"{prefix}first_name", Value(" "), f"{prefix}last_name", output_field=TextField()))
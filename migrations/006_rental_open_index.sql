@@ -0,0 +1,9 @@
+-- Partial index on open rentals (return_date IS NULL)
+-- Availability checks only ever look for open rentals of an inventory item,
+-- so this index stays small no matter how much rental history accumulates.
+
+-- An inventory item can only be rented out once at a time, so the index is
+-- unique. This also guarantees the invariant at the database level.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_unq_rental_open_inventory_id
+ON rental(inventory_id)
+WHERE return_date IS NULL;
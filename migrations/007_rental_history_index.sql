@@ -0,0 +1,5 @@
+-- Index for rental history listings
+-- Serves "rentals of a customer, newest first" (keyset pagination on
+-- rental_date, rental_id) without scanning the whole rental table.
+CREATE INDEX IF NOT EXISTS idx_rental_customer_id_rental_date
+ON rental(customer_id, rental_date DESC, rental_id DESC);
@@ -0,0 +1,16 @@
+-- Stored responses for Idempotency-Key request headers
+-- Lets clients safely retry POST /api/rentals/ and POST /api/payments/:
+-- a repeated key replays the stored response instead of creating a duplicate.
+-- response_body holds the serialized JSON text so replays keep the original key order.
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    status_code SMALLINT NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+
+-- Used by TTL-based eviction (manage.py purge_idempotency_keys)
+CREATE INDEX IF NOT EXISTS idx_idempotency_key_created_at ON idempotency_key(created_at);
@@ -0,0 +1,16 @@
+-- Late-fee and replacement charges produced by the billing run
+-- (manage.py run_billing). One row per overdue rental; re-running the
+-- billing for the same rentals overwrites the row instead of duplicating it.
+CREATE TABLE IF NOT EXISTS rental_charge (
+    rental_id INTEGER PRIMARY KEY REFERENCES rental(rental_id) ON DELETE CASCADE,
+    customer_id INTEGER NOT NULL,
+    overdue_days INTEGER NOT NULL,
+    late_fee NUMERIC(7,2) NOT NULL,
+    replacement_fee NUMERIC(5,2) NOT NULL,
+    amount NUMERIC(7,2) NOT NULL,
+    effective_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    billed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Per-customer charge totals (account balance)
+CREATE INDEX IF NOT EXISTS idx_rental_charge_customer_id ON rental_charge(customer_id);
@@ -0,0 +1,5 @@
+-- Index for payment lookups by rental
+-- payment is partitioned by payment_date and only customer_id/staff_id were
+-- indexed, so ?rental_id= scanned every partition. Creating the index on the
+-- partitioned parent creates a matching index on each monthly partition.
+CREATE INDEX IF NOT EXISTS idx_payment_rental_id ON payment(rental_id);
@@ -0,0 +1,15 @@
+-- Trigram indexes for typeahead search
+-- Django's icontains/istartswith compile to UPPER(col::text) LIKE UPPER('%q%'),
+-- which btree indexes (idx_title, idx_actor_last_name) cannot serve. GIN
+-- trigram indexes on the same upper() expressions turn these substring
+-- searches into index scans.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_film_title_trgm
+ON film USING gin (upper(title) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_actor_first_name_trgm
+ON actor USING gin (upper(first_name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_actor_last_name_trgm
+ON actor USING gin (upper(last_name) gin_trgm_ops);
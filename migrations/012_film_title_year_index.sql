@@ -0,0 +1,6 @@
+-- Natural-key index for bulk film imports
+-- FilmImportService matches feed rows to existing films on
+-- (upper(title), release_year); this lets each batch resolve its film IDs
+-- with index lookups instead of scanning the whole film table.
+CREATE INDEX IF NOT EXISTS idx_film_upper_title_release_year
+ON film (upper(title), release_year);
@@ -0,0 +1,23 @@
+-- "Customers who rented this also rented" recommendations
+-- film_co_rental holds, for each ordered pair of films, the number of
+-- distinct customers who rented both. manage.py build_recommendations
+-- maintains it incrementally from rentals newer than the watermark in
+-- film_co_rental_state; the film detail page reads the top-k rows of one
+-- film through idx_film_co_rental_top.
+CREATE TABLE IF NOT EXISTS film_co_rental (
+    film_id INTEGER NOT NULL REFERENCES film(film_id) ON DELETE CASCADE,
+    similar_film_id INTEGER NOT NULL REFERENCES film(film_id) ON DELETE CASCADE,
+    customers INTEGER NOT NULL,
+    last_update TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (film_id, similar_film_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_film_co_rental_top
+ON film_co_rental (film_id, customers DESC, similar_film_id);
+
+-- Highest rental_id already counted into film_co_rental (single row)
+CREATE TABLE IF NOT EXISTS film_co_rental_state (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    last_rental_id INTEGER NOT NULL,
+    last_update TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
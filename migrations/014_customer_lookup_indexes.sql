@@ -0,0 +1,18 @@
+-- Indexed access paths for customer counter lookups (/api/customers/lookup/)
+-- idx_customer_email (004_customer_auth.sql) is a case-sensitive btree that
+-- cannot serve case-insensitive matches, and ?search= compiles to
+-- UPPER(col::text) LIKE UPPER('%q%') scans. The expressions below match what
+-- CustomerLookupService (apps/account/services.py) compiles to.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Name search: every word of the query as a substring of the full name
+CREATE INDEX IF NOT EXISTS idx_customer_full_name_trgm
+ON customer USING gin (upper(first_name || ' ' || last_name) gin_trgm_ops);
+
+-- Exact email lookups, ignoring case
+CREATE INDEX IF NOT EXISTS idx_customer_email_lower
+ON customer (lower(email));
+
+-- Phone lookups by digits only, so "+1 (403) 333-5568" finds 14033335568
+CREATE INDEX IF NOT EXISTS idx_address_phone_digits
+ON address (regexp_replace(phone, '\D', '', 'g'));